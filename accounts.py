@@ -0,0 +1,162 @@
+import logging
+import os
+import threading
+import time
+from driver_pool import DEFAULT_WORKERS
+from rate_limiter import TokenBucket, DEFAULT_RATE, DEFAULT_BURST, DEFAULT_MAX_BACKOFF, RECOVERY_SUCCESSES
+from session_store import DEFAULT_SESSION_FILE
+from x_urls import RATE_LIMITED, LOGGED_OUT, CHALLENGE
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_QUARANTINE = 900  # Seconds an account sits out after its first rate limit or challenge
+DEFAULT_MAX_QUARANTINE = 4 * 3600
+# Failures that say something about the account rather than the link
+QUARANTINE_REASONS = (RATE_LIMITED, LOGGED_OUT, CHALLENGE)
+# Result of a link bounced by a worker whose account was quarantined while it held the link
+QUARANTINED = "quarantined"
+
+
+def session_path_for(path, name):
+    """Per-account session file next to the configured one, e.g. x_session_alice.json"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}_{name}{ext}"
+
+
+class Account:
+    """One set of X credentials with its own session file, workers and rate budget"""
+
+    def __init__(self, name, credentials, session_path, limiter, workers=DEFAULT_WORKERS):
+        self.name = name
+        self.credentials = credentials
+        self.session_path = session_path
+        self.limiter = limiter
+        self.workers = max(1, int(workers))
+        self.quarantine_level = 0
+        self.quarantined_until = 0.0
+        self.quarantines = 0
+        self.resolved = 0
+        self.failed = 0
+        self.consecutive_successes = 0
+
+    def is_quarantined(self):
+        return time.monotonic() < self.quarantined_until
+
+
+def load_accounts(config):
+    """Build the accounts from the x_accounts list, or the single x_credentials block
+
+    Each entry may override ``session_path``, ``rate``, ``burst`` and
+    ``workers``; the session, rate_limit and pool sections are the defaults.
+    """
+    session_path = (config.get('session') or {}).get('path', DEFAULT_SESSION_FILE)
+    rate_config = config.get('rate_limit') or {}
+    pool_config = config.get('pool') or {}
+    entries = config.get('x_accounts') or [config['x_credentials']]
+
+    accounts = []
+    for credentials in entries:
+        name = credentials.get('account_name') or credentials['username']
+        accounts.append(Account(
+            name,
+            credentials,
+            session_path=credentials.get('session_path') or (
+                session_path if len(entries) == 1 else session_path_for(session_path, name)
+            ),
+            limiter=TokenBucket(
+                rate=credentials.get('rate', rate_config.get('rate', DEFAULT_RATE)),
+                burst=credentials.get('burst', rate_config.get('burst', DEFAULT_BURST)),
+                max_backoff=rate_config.get('max_backoff', DEFAULT_MAX_BACKOFF),
+            ),
+            workers=credentials.get('workers', pool_config.get('workers', DEFAULT_WORKERS)),
+        ))
+    return accounts
+
+
+class AccountScheduler:
+    """Spread links over several logged-in accounts and quarantine unhealthy ones
+
+    Workers pull from one shared queue, but only while their account is out of
+    quarantine and has a token in its own bucket, so every account takes work
+    in proportion to its healthy throughput. An account that is rate limited or
+    challenged sits out for an exponentially growing period; the links it held
+    are handed back for the other accounts.
+    """
+
+    def __init__(self, accounts, quarantine=DEFAULT_QUARANTINE, max_quarantine=DEFAULT_MAX_QUARANTINE):
+        self.accounts = list(accounts)
+        self.quarantine_base = quarantine
+        self.max_quarantine = max_quarantine
+        self._by_driver = {}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def assign(self, driver, account):
+        self._by_driver[id(driver)] = account
+
+    def account_for(self, driver):
+        return self._by_driver[id(driver)]
+
+    @property
+    def sharded(self):
+        return len(self.accounts) > 1
+
+    def wait_until_ready(self, driver):
+        """Block a worker while its account is quarantined, then take one token from its bucket"""
+        account = self.account_for(driver)
+        while account.is_quarantined():
+            time.sleep(min(5.0, max(0.05, account.quarantined_until - time.monotonic())))
+        account.limiter.acquire()
+
+    def record(self, account, result):
+        """Update the account's rate budget and health from one resolve result"""
+        username, method = result
+        if method == RATE_LIMITED:
+            account.limiter.on_rate_limited()
+        else:
+            account.limiter.on_success()
+
+        with self._lock:
+            if username:
+                account.resolved += 1
+                account.consecutive_successes += 1
+                if account.quarantine_level and account.consecutive_successes >= RECOVERY_SUCCESSES:
+                    account.quarantine_level -= 1
+                    account.consecutive_successes = 0
+                return
+            account.failed += 1
+            account.consecutive_successes = 0
+            # With a single account there is nobody to hand work to; the token bucket backoff is enough
+            if method in QUARANTINE_REASONS and self.sharded and not account.is_quarantined():
+                account.quarantine_level += 1
+                account.quarantines += 1
+                duration = min(self.max_quarantine, self.quarantine_base * 2 ** (account.quarantine_level - 1))
+                account.quarantined_until = time.monotonic() + duration
+                logger.warning(f"Quarantining @{account.name} for {duration:.0f}s after {method}")
+
+    def can_reassign(self, account):
+        """True if another account is out of quarantine and can take over ``account``'s links"""
+        return self.sharded and any(
+            other is not account and not other.is_quarantined() for other in self.accounts
+        )
+
+    def report(self):
+        """Log how the work was spread over the accounts"""
+        if not self.sharded:
+            return
+        minutes = max(1e-6, (time.monotonic() - self.started) / 60)
+        for account in self.accounts:
+            logger.info(
+                f"Account @{account.name}: {account.resolved} resolved, {account.failed} failed, "
+                f"{account.resolved / minutes:.1f} IDs/min, {account.quarantines} quarantine(s)"
+            )
+
+
+def load_scheduler(accounts, config):
+    """Create the scheduler with the quarantine settings from config.yml"""
+    quarantine_config = config.get('quarantine') or {}
+    return AccountScheduler(
+        accounts,
+        quarantine=quarantine_config.get('base', DEFAULT_QUARANTINE),
+        max_quarantine=quarantine_config.get('max', DEFAULT_MAX_QUARANTINE),
+    )
@@ -0,0 +1,103 @@
+import glob
+import json
+import logging
+import os
+import re
+from x_urls import parse_account_id
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_ARCHIVE_FILE = "follower.json"
+CHUNK_SIZE = 64 * 1024
+# Entry types found in follower.js / following.js archives
+ARCHIVE_ITEM_KEYS = ("follower", "following")
+
+_SEPARATOR = re.compile(r'[\s,]*')
+_PART_NUMBER = re.compile(r'part(\d+)')
+
+
+def _part_sort_key(path):
+    match = _PART_NUMBER.search(os.path.basename(path))
+    return (int(match.group(1)) if match else -1, path)
+
+
+def expand_archive_paths(paths):
+    """Expand archive paths into the list of files to read
+
+    Accepts plain files, glob patterns and directories. A plain file also pulls
+    in its sibling part files, e.g. follower.js -> follower-part1.js, follower-part2.js.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            for key in ARCHIVE_ITEM_KEYS:
+                matches = glob.glob(os.path.join(path, f"{key}*.js")) + glob.glob(os.path.join(path, f"{key}*.json"))
+                expanded += sorted(matches, key=_part_sort_key)
+        elif glob.has_magic(path):
+            expanded += sorted(glob.glob(path), key=_part_sort_key)
+        else:
+            stem, ext = os.path.splitext(path)
+            expanded.append(path)
+            expanded += sorted(glob.glob(f"{glob.escape(stem)}-part*{ext}"), key=_part_sort_key)
+
+    # Keep the first occurrence of every file
+    seen = set()
+    return [path for path in expanded if not (path in seen or seen.add(path))]
+
+
+def iter_archive_items(path, chunk_size=CHUNK_SIZE):
+    """Yield the items of an archive array one at a time
+
+    Handles plain JSON arrays as well as the ``window.YTD.follower.part0 = [...]``
+    JavaScript form. Only one chunk plus the current item is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as file:
+        # Skip the JavaScript assignment prefix, up to the opening bracket
+        buffer = ""
+        while "[" not in buffer:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"No JSON array found in {path}")
+            buffer += chunk
+        buffer = buffer[buffer.index("[") + 1:]
+        position = 0
+        eof = False
+
+        while True:
+            position = _SEPARATOR.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                if position >= len(buffer):
+                    raise json.JSONDecodeError("Need more data", buffer, position)
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Truncated or invalid archive data in {path} near offset {position}")
+                # The next item straddles the chunk boundary; read more
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+
+
+def iter_user_links(paths):
+    """Lazily yield (account_id, userLink) for every entry in the archive files"""
+    for path in expand_archive_paths(paths):
+        logger.info(f"Streaming archive entries from {path}")
+        count = 0
+        for item in iter_archive_items(path):
+            for key in ARCHIVE_ITEM_KEYS:
+                entry = item.get(key) if isinstance(item, dict) else None
+                if not entry or "userLink" not in entry:
+                    continue
+                account_id = entry.get("accountId")
+                account_id = int(account_id) if str(account_id).isdigit() else parse_account_id(entry["userLink"])
+                count += 1
+                yield account_id, entry["userLink"]
+        logger.info(f"Read {count} user links from {path}")
@@ -0,0 +1,111 @@
+import json
+from urllib.parse import quote
+
+DEFAULT_BATCH_SIZE = 100
+# REST v1.1 shape by default; the GraphQL UsersByRestIds shape works with e.g.
+# results_path "data.users", id_path "rest_id", screen_name_path "legacy.screen_name"
+DEFAULT_LOOKUP_URL = "https://api.x.com/1.1/users/lookup.json?user_id={ids}"
+DEFAULT_RESULTS_PATH = ""
+DEFAULT_ID_PATH = "id_str"
+DEFAULT_SCREEN_NAME_PATH = "screen_name"
+DEFAULT_PAGE_ORIGIN = "https://x.com/"
+MAX_CONSECUTIVE_ERRORS = 3
+
+# Runs inside the logged-in page so the request carries the session cookies.
+# The csrf header mirrors the ct0 cookie, as the web client does.
+LOOKUP_SCRIPT = """
+var url = arguments[0], headers = arguments[1] || {}, done = arguments[arguments.length - 1];
+var csrf = (document.cookie.match(/(?:^|; )ct0=([^;]+)/) || [])[1];
+if (csrf && !headers['x-csrf-token']) { headers['x-csrf-token'] = csrf; }
+fetch(url, {credentials: 'include', headers: headers})
+    .then(function (response) {
+        return response.text().then(function (body) { done({status: response.status, body: body}); });
+    })
+    .catch(function (error) { done({status: 0, body: String(error)}); });
+"""
+
+
+def get_path(data, path):
+    """Follow a dotted path such as "legacy.screen_name" through nested dicts"""
+    for key in filter(None, (path or "").split(".")):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class BatchLookupError(Exception):
+    """The lookup endpoint returned something other than a usable response"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class BatchLookup:
+    """Resolve up to ``batch_size`` account IDs per request from inside the logged-in page
+
+    The endpoint URL template (with an ``{ids}`` placeholder for comma-separated
+    IDs) and the response shape are configurable, so it can follow changes to
+    the web client or point at a local stub serving fixture JSON.
+    """
+
+    def __init__(self, lookup_url=DEFAULT_LOOKUP_URL, headers=None, batch_size=DEFAULT_BATCH_SIZE,
+                 results_path=DEFAULT_RESULTS_PATH, id_path=DEFAULT_ID_PATH,
+                 screen_name_path=DEFAULT_SCREEN_NAME_PATH, page_origin=DEFAULT_PAGE_ORIGIN):
+        self.lookup_url = lookup_url
+        self.headers = headers or {}
+        self.batch_size = max(1, int(batch_size))
+        self.results_path = results_path
+        self.id_path = id_path
+        self.screen_name_path = screen_name_path
+        self.page_origin = page_origin
+
+    def build_url(self, account_ids):
+        ids = ",".join(str(account_id) for account_id in account_ids)
+        return self.lookup_url.replace("{ids}", quote(ids, safe=","))
+
+    def parse_response(self, body):
+        """Map the JSON response body to {account_id: screen_name}"""
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise BatchLookupError(f"Lookup response is not JSON: {e}")
+        users = get_path(data, self.results_path)
+        if not isinstance(users, list):
+            raise BatchLookupError(f"No user list at '{self.results_path or '<root>'}' in lookup response")
+
+        found = {}
+        for user in users:
+            account_id = get_path(user, self.id_path)
+            screen_name = get_path(user, self.screen_name_path)
+            if account_id is not None and screen_name and str(account_id).isdigit():
+                found[int(account_id)] = screen_name
+        return found
+
+    def lookup(self, driver, account_ids):
+        """Look up one batch in the driver's page; returns {account_id: screen_name}"""
+        # Same-origin context is needed for the session cookies and csrf token
+        if not driver.current_url.startswith(self.page_origin):
+            driver.get(self.page_origin)
+        response = driver.execute_async_script(LOOKUP_SCRIPT, self.build_url(account_ids), dict(self.headers))
+        status = (response or {}).get("status")
+        if status != 200:
+            raise BatchLookupError(f"Lookup request returned status {status}", status=status)
+        return self.parse_response(response.get("body", ""))
+
+
+def load_batch_lookup(config):
+    """Build a BatchLookup from the batch_lookup section of config.yml, or None if disabled"""
+    lookup_config = config.get('batch_lookup') or {}
+    if not lookup_config.get('enabled', False):
+        return None
+    return BatchLookup(
+        lookup_url=lookup_config.get('url', DEFAULT_LOOKUP_URL),
+        headers=lookup_config.get('headers'),
+        batch_size=lookup_config.get('batch_size', DEFAULT_BATCH_SIZE),
+        results_path=lookup_config.get('results_path', DEFAULT_RESULTS_PATH),
+        id_path=lookup_config.get('id_path', DEFAULT_ID_PATH),
+        screen_name_path=lookup_config.get('screen_name_path', DEFAULT_SCREEN_NAME_PATH),
+        page_origin=lookup_config.get('page_origin', DEFAULT_PAGE_ORIGIN),
+    )
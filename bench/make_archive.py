@@ -0,0 +1,78 @@
+"""Write synthetic follower.js / follower.json archives of any size
+
+  python bench/make_archive.py 1000000 -o bench_data/follower-1m.js
+
+Entries are written one at a time, so a million-entry archive needs no more
+memory than a small one. Account IDs are deterministic for a given seed.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+
+DEFAULT_SEED = 0
+USER_LINK = "https://twitter.com/intent/user?user_id={}"
+
+
+def _permutation(start, stop, rng):
+    """Return f(i) mapping 0 .. stop-start-1 one-to-one onto a scrambled order of [start, stop)"""
+    size = stop - start
+    step = rng.randrange(size // 3, size) | 1
+    while math.gcd(step, size) != 1:
+        step += 2
+    offset = rng.randrange(size)
+    return lambda index: start + (offset + index * step) % size
+
+
+def account_ids(count, seed=DEFAULT_SEED):
+    """Yield ``count`` distinct account IDs spread over realistic magnitudes
+
+    Each magnitude range is walked through a fixed permutation, so IDs never
+    repeat and none of them has to be remembered.
+    """
+    rng = random.Random(seed)
+    # Mix of old short IDs and modern 19-digit snowflake IDs
+    short_ids = _permutation(10 ** 5, 10 ** 10, rng)
+    snowflakes = _permutation(10 ** 17, 2 * 10 ** 18, rng)
+    used_short = used_snowflakes = 0
+    for _ in range(count):
+        if rng.random() < 0.4:
+            yield short_ids(used_short)
+            used_short += 1
+        else:
+            yield snowflakes(used_snowflakes)
+            used_snowflakes += 1
+
+
+def write_archive(path, count, key="follower", js=None, seed=DEFAULT_SEED):
+    """Write ``count`` entries to ``path``; ``js`` (default: a .js extension) adds the window.YTD prefix"""
+    if js is None:
+        js = path.endswith(".js")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f"window.YTD.{key}.part0 = [\n" if js else "[\n")
+        for index, account_id in enumerate(account_ids(count, seed)):
+            item = {key: {"accountId": str(account_id), "userLink": USER_LINK.format(account_id)}}
+            file.write(("  " if index == 0 else ",\n  ") + json.dumps(item))
+        file.write("\n]\n")
+    return path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a synthetic X follower/following archive")
+    parser.add_argument("count", type=int, help="number of entries, e.g. 100 or 1000000")
+    parser.add_argument("-o", "--output", default="follower.json", help="archive path (.js adds the window.YTD prefix)")
+    parser.add_argument("--key", default="follower", choices=("follower", "following"))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    write_archive(args.output, args.count, key=args.key, seed=args.seed)
+    print(f"Wrote {args.count} entries to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+"""Local stand-in for the parts of X that account-ID resolution touches
+
+Every account ID is assigned one scenario, deterministically, from a weighted
+mix so each run sees the same traffic:
+
+  profile       intent link redirects to x.com/<name>
+  screen_name   intent link redirects to x.com/intent/user?screen_name=<name>
+  chain         several relative hops before the profile redirect
+  meta          lands on a page that only names the account in meta tags
+  title         lands on a page that only names the account in <title>
+  rate_limited  intent link answers 429 (weight 0 by default; add it to the
+                mix to see how the resolvers back off or hand off)
+  suspended     intent link redirects to the suspended-account page
+
+The expected username for account N is always "user<N>", so callers can
+check what they resolved. The batch lookup endpoints answer with fixture JSON
+built from the same mix, in the REST v1.1 shape
+
+  /1.1/users/lookup.json?user_id=1,2,3   [{"id_str": "1", "screen_name": "user1"}, ...]
+
+and the GraphQL shape (results_path "data.users", id_path "rest_id",
+screen_name_path "legacy.screen_name")
+
+  /graphql/UsersByRestIds?user_ids=1,2,3  {"data": {"users": [{"rest_id": "1", "legacy": {...}}]}}
+
+Suspended accounts are left out of the response, as X does, so callers fall
+through to per-link resolution for them; a batch holding a rate_limited
+account answers 429. Run standalone to serve it, e.g.
+
+  python bench/mock_x.py --port 8080 --latency 50 --jitter 20
+"""
+import argparse
+import html
+import json
+import random
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SCENARIOS = ("profile", "screen_name", "chain", "meta", "title", "rate_limited", "suspended")
+DEFAULT_MIX = "profile=55,screen_name=15,chain=10,meta=8,title=5,rate_limited=0,suspended=5"
+DEFAULT_HOPS = 3
+PUBLIC_ORIGIN = "https://x.com"
+REST_LOOKUP_PATH = "/1.1/users/lookup.json"
+GRAPHQL_LOOKUP_PATH = "/graphql/UsersByRestIds"
+
+
+def parse_mix(text):
+    """Parse "scenario=weight,..." into a list of (scenario, weight)"""
+    mix = []
+    for part in filter(None, (text or "").split(",")):
+        scenario, _, weight = part.partition("=")
+        scenario = scenario.strip()
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{scenario}', expected one of {', '.join(SCENARIOS)}")
+        mix.append((scenario, int(weight or 1)))
+    if not mix or not sum(weight for _, weight in mix):
+        raise ValueError("The scenario mix needs at least one positive weight")
+    return mix
+
+
+def scenario_for(account_id, mix):
+    """Pick the scenario for an account ID; stable across runs and processes"""
+    bucket = (account_id * 2654435761) % (2 ** 32) % sum(weight for _, weight in mix)
+    for scenario, weight in mix:
+        if bucket < weight:
+            return scenario
+        bucket -= weight
+    return mix[-1][0]
+
+
+def expected_username(account_id):
+    return f"user{account_id}"
+
+
+def _page(title="X", meta=None, body=""):
+    tags = "".join(
+        f'<meta property="{html.escape(name)}" content="{html.escape(content)}">' for name, content in (meta or {}).items()
+    )
+    return (
+        f"<!DOCTYPE html><html><head><title>{html.escape(title)}</title>{tags}</head>"
+        f"<body>{body}</body></html>"
+    ).encode("utf-8")
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections once a benchmark opens more at once
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections at the end of a run are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class MockX:
+    """Scenario mix plus simulated latency shared by every request handler"""
+
+    def __init__(self, mix=DEFAULT_MIX, latency=0.0, jitter=0.0, hops=DEFAULT_HOPS, seed=0):
+        self.mix = parse_mix(mix) if isinstance(mix, str) else mix
+        self.latency = latency
+        self.jitter = jitter
+        self.hops = max(1, int(hops))
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if not (self.latency or self.jitter):
+            return
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency + jitter))
+
+    def handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", location=None, content_type="text/html; charset=utf-8"):
+                self.send_response(status)
+                if location:
+                    self.send_header("Location", location)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                mock.delay()
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                path = url.path.rstrip("/") or "/"
+
+                if path == "/intent/user" and "screen_name" in query:
+                    name = query["screen_name"]
+                    return self._send(200, _page(title=f"User (@{name}) / X"))
+                if path == "/intent/user" and query.get("user_id", "").isdigit():
+                    return self._intent(int(query["user_id"]))
+                if path == "/i/redirect" and query.get("user_id", "").isdigit():
+                    account_id, left = int(query["user_id"]), int(query.get("left", "0"))
+                    if left > 0:
+                        return self._send(302, location=f"/i/redirect?user_id={account_id}&left={left - 1}")
+                    return self._send(302, location=f"{PUBLIC_ORIGIN}/{expected_username(account_id)}")
+                if path.startswith("/i/user/") and path[len("/i/user/"):].isdigit():
+                    return self._landing(int(path[len("/i/user/"):]))
+                if path in (REST_LOOKUP_PATH, GRAPHQL_LOOKUP_PATH):
+                    ids = [int(value) for value in query.get("user_id", query.get("user_ids", "")).split(",") if value.isdigit()]
+                    return self._lookup(ids, graphql=path == GRAPHQL_LOOKUP_PATH)
+                if path == "/account/suspended":
+                    return self._send(200, _page(title="X", body="<h1>Account suspended</h1>"))
+                if path.count("/") == 1 and len(path) > 1:
+                    name = path[1:]
+                    return self._send(200, _page(title=f"User (@{name}) / X", body=f"<div data-testid=\"UserName\">@{name}</div>"))
+                return self._send(404, _page(title="Page not found / X"))
+
+            def _intent(self, account_id):
+                scenario = scenario_for(account_id, mock.mix)
+                name = expected_username(account_id)
+                if scenario == "profile":
+                    return self._send(302, location=f"{PUBLIC_ORIGIN}/{name}")
+                if scenario == "screen_name":
+                    return self._send(302, location=f"{PUBLIC_ORIGIN}/intent/user?screen_name={name}")
+                if scenario == "chain":
+                    return self._send(302, location=f"/i/redirect?user_id={account_id}&left={mock.hops - 1}")
+                if scenario in ("meta", "title"):
+                    return self._send(302, location=f"{PUBLIC_ORIGIN}/i/user/{account_id}")
+                if scenario == "rate_limited":
+                    return self._send(429, b"Rate limit exceeded", content_type="text/plain")
+                return self._send(302, location=f"{PUBLIC_ORIGIN}/account/suspended")
+
+            def _lookup(self, account_ids, graphql):
+                scenarios = {account_id: scenario_for(account_id, mock.mix) for account_id in account_ids}
+                if "rate_limited" in scenarios.values():
+                    return self._send(429, b'{"errors": [{"code": 88, "message": "Rate limit exceeded"}]}',
+                                      content_type="application/json")
+                found = [account_id for account_id, scenario in scenarios.items() if scenario != "suspended"]
+                if graphql:
+                    data = {"data": {"users": [
+                        {"rest_id": str(account_id), "legacy": {"screen_name": expected_username(account_id)}}
+                        for account_id in found
+                    ]}}
+                else:
+                    data = [{"id_str": str(account_id), "screen_name": expected_username(account_id)} for account_id in found]
+                return self._send(200, json.dumps(data).encode("utf-8"), content_type="application/json")
+
+            def _landing(self, account_id):
+                name = expected_username(account_id)
+                if scenario_for(account_id, mock.mix) == "title":
+                    return self._send(200, _page(title=f"User (@{name}) / X"))
+                return self._send(200, _page(title="Profile / X", meta={
+                    "og:url": f"{PUBLIC_ORIGIN}/{name}",
+                    "twitter:creator": f"@{name}",
+                }))
+
+        return Handler
+
+
+def serve(mock, port=0, tls_port=None, certfile=None, keyfile=None):
+    """Start plain (and optionally TLS) listeners on daemon threads; returns the servers"""
+    servers = [QuietHTTPServer(("127.0.0.1", port), mock.handler())]
+    if tls_port is not None:
+        tls_server = QuietHTTPServer(("127.0.0.1", tls_port), mock.handler())
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        tls_server.socket = context.wrap_socket(tls_server.socket, server_side=True)
+        servers.append(tls_server)
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a local mock of X's account redirects")
+    parser.add_argument("--port", type=int, default=0, help="plain HTTP port (0 picks a free one)")
+    parser.add_argument("--tls-port", type=int, help="also serve HTTPS on this port (needs --cert and --key)")
+    parser.add_argument("--cert", help="PEM certificate for --tls-port")
+    parser.add_argument("--key", help="PEM private key for --tls-port")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--latency", type=float, default=0.0, help="added latency per request, in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform +/- jitter on the latency, in ms")
+    parser.add_argument("--hops", type=int, default=DEFAULT_HOPS, help="redirects in a chain scenario")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    mock = MockX(args.mix, latency=args.latency / 1000, jitter=args.jitter / 1000, hops=args.hops)
+    servers = serve(mock, args.port, args.tls_port, args.cert, args.key)
+    # First line of output is machine-readable so run_bench.py can find the ports
+    print(" ".join(str(server.server_address[1]) for server in servers), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+"""Offline throughput benchmark for the resolver modes, against bench/mock_x.py
+
+  python bench/run_bench.py --sizes 100 10000 --modes parse http --latency 20
+  python bench/run_bench.py --sizes 1000 --modes browser tabs --browser-limit 200
+  python bench/run_bench.py ... --output new.json --compare old.json
+  python bench/run_bench.py --modes http --mix profile=90,rate_limited=10
+
+Modes:
+  parse         stream the archive only (archive_reader)
+  http          HTTP fast path (http_resolver) with host_map pointed at the mock;
+                after a 429 the rest is left to the browser, as in a real run,
+                and the handoff column shows how many links resolved before it
+  browser       engine.get_username_from_url in one Chrome
+  browser-lean  the same with the lean browser profile
+  tabs          cdp_tabs.TabMultiplexer with --tabs tabs in one Chrome
+  lookup        batch_lookup.BatchLookup against the mock's REST lookup fixture,
+                fetched with urllib instead of a logged-in page
+  lookup-graphql  the same against the GraphQL-shaped fixture
+
+Each mode runs in its own process so peak RSS is per mode (Chrome's own
+processes are not included). Browser modes route twitter.com and x.com to the
+mock's HTTPS listener with Chrome host resolver rules and a throwaway
+self-signed certificate made with openssl; they only visit the first
+--browser-limit links of each archive.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from make_archive import write_archive  # noqa: E402
+from mock_x import DEFAULT_MIX, DEFAULT_HOPS  # noqa: E402
+
+MODES = ("parse", "http", "lookup", "lookup-graphql", "browser", "browser-lean", "tabs")
+BROWSER_MODES = ("browser", "browser-lean", "tabs")
+DEFAULT_SIZES = (100, 10000)
+DEFAULT_BROWSER_LIMIT = 200
+DEFAULT_WORKDIR = "bench_data"
+DEFAULT_THRESHOLD = 0.15  # Flag a mode when IDs/sec drops or p99 grows by more than this
+ERROR_WIDTH = 100
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# --- Child side: one mode, one archive, one JSON line on stdout ---
+
+def _links(archive, limit=None):
+    from archive_reader import iter_user_links
+    for index, (_, url) in enumerate(iter_user_links([archive])):
+        if limit is not None and index >= limit:
+            return
+        yield url
+
+
+def _check(url, username):
+    from x_urls import parse_account_id
+    return username == f"user{parse_account_id(url)}"
+
+
+def bench_parse(args):
+    count = sum(1 for _ in _links(args.archive))
+    return {"ids": count, "resolved": count, "correct": count, "latencies": []}
+
+
+def bench_http(args):
+    import itertools
+    import http_resolver
+    resolver = http_resolver.HttpResolver(
+        concurrency=args.concurrency,
+        host_map={"https://twitter.com": args.mock_url, "https://x.com": args.mock_url},
+    )
+    stats = {"ids": 0, "resolved": 0, "correct": 0, "latencies": [], "handoff_after": None}
+
+    def on_result(url, result, elapsed):
+        stats["resolved"] += 1
+        stats["correct"] += _check(url, result[0])
+        stats["latencies"].append(elapsed)
+
+    # Like engine.resolve_links, the first 429 hands every remaining link to the
+    # browser; those links count as unresolved and the handoff point is reported
+    links = _links(args.archive)
+    while True:
+        batch = list(itertools.islice(links, http_resolver.DEFAULT_BATCH_SIZE))
+        if not batch:
+            break
+        stats["ids"] += len(batch)
+        if resolver.rate_limited:
+            continue
+        resolver.resolve(batch, on_result)
+        if resolver.rate_limited:
+            stats["handoff_after"] = stats["resolved"]
+    return stats
+
+
+class _UrlopenPage:
+    """Just enough of a driver for BatchLookup.lookup: the fetch runs through urllib against the mock"""
+
+    current_url = "https://x.com/"
+
+    def __init__(self, mock_url):
+        self.mock_url = mock_url
+
+    def get(self, url):
+        self.current_url = url
+
+    def execute_async_script(self, script, url, headers):
+        import urllib.error
+        import urllib.request
+        from http_resolver import rewrite_origin
+        request = urllib.request.Request(rewrite_origin(url, {"https://api.x.com": self.mock_url}), headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return {"status": response.status, "body": response.read().decode("utf-8")}
+        except urllib.error.HTTPError as e:
+            return {"status": e.code, "body": e.read().decode("utf-8")}
+
+
+def bench_lookup(args, graphql=False):
+    import itertools
+    import batch_lookup
+    from x_urls import parse_account_id
+    if graphql:
+        lookup = batch_lookup.BatchLookup(
+            lookup_url="https://api.x.com/graphql/UsersByRestIds?user_ids={ids}",
+            results_path="data.users", id_path="rest_id", screen_name_path="legacy.screen_name",
+        )
+    else:
+        lookup = batch_lookup.BatchLookup()
+    page = _UrlopenPage(args.mock_url)
+    stats = {"ids": 0, "resolved": 0, "correct": 0, "latencies": []}
+    links = _links(args.archive)
+    while True:
+        ids = [parse_account_id(url) for url in itertools.islice(links, lookup.batch_size)]
+        if not ids:
+            break
+        stats["ids"] += len(ids)
+        started = time.perf_counter()
+        try:
+            found = lookup.lookup(page, ids)
+        except batch_lookup.BatchLookupError:
+            # The whole batch would fall through to the browser, e.g. after a 429
+            found = {}
+        stats["latencies"].append(time.perf_counter() - started)
+        # IDs missing from the response (suspended in the mock) fall through and count as unresolved
+        stats["resolved"] += len(found)
+        stats["correct"] += sum(1 for account_id, name in found.items() if name == f"user{account_id}")
+    return stats
+
+
+def _browser(args, lean=False):
+    import engine
+    return engine.setup_driver(
+        headless=True,
+        debugging_port=args.debugging_port,
+        lean=lean,
+        page_load_timeout=engine.DEFAULT_PAGE_LOAD_TIMEOUT if lean else None,
+        extra_arguments=[
+            f"--host-resolver-rules=MAP twitter.com 127.0.0.1:{args.tls_port}, MAP x.com 127.0.0.1:{args.tls_port}",
+            "--ignore-certificate-errors",
+        ],
+    )
+
+
+def bench_browser(args, lean=False):
+    import engine
+    driver = _browser(args, lean)
+    stats = {"ids": 0, "resolved": 0, "correct": 0, "latencies": []}
+    try:
+        for url in _links(args.archive, args.browser_limit):
+            started = time.perf_counter()
+            username, _ = engine.get_username_from_url(driver, url)
+            stats["latencies"].append(time.perf_counter() - started)
+            stats["ids"] += 1
+            if username:
+                stats["resolved"] += 1
+                stats["correct"] += _check(url, username)
+    finally:
+        driver.quit()
+    return stats
+
+
+def bench_tabs(args):
+    import cdp_tabs
+    driver = _browser(args)
+    multiplexer = cdp_tabs.TabMultiplexer(driver, tabs=args.tabs)
+    stats = {"ids": 0, "resolved": 0, "correct": 0, "latencies": []}
+    lock = threading.Lock()
+
+    def resolve(url):
+        started = time.perf_counter()
+        username, _ = multiplexer.resolve(url)
+        elapsed = time.perf_counter() - started
+        with lock:
+            stats["latencies"].append(elapsed)
+            stats["ids"] += 1
+            if username:
+                stats["resolved"] += 1
+                stats["correct"] += _check(url, username)
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.tabs) as executor:
+            list(executor.map(resolve, _links(args.archive, args.browser_limit)))
+    finally:
+        multiplexer.close()
+        driver.quit()
+    return stats
+
+
+def run_child(args):
+    logging.getLogger("follower_extractor").setLevel(logging.ERROR)
+    benches = {
+        "parse": bench_parse,
+        "http": bench_http,
+        "lookup": bench_lookup,
+        "lookup-graphql": lambda args: bench_lookup(args, graphql=True),
+        "browser": bench_browser,
+        "browser-lean": lambda args: bench_browser(args, lean=True),
+        "tabs": bench_tabs,
+    }
+    started = time.perf_counter()
+    stats = benches[args.child](args)
+    elapsed = time.perf_counter() - started
+    latencies = stats.pop("latencies")
+    p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+    print(json.dumps(dict(
+        stats,
+        seconds=round(elapsed, 3),
+        ids_per_sec=round(stats["ids"] / elapsed, 1) if elapsed else None,
+        p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+        p99_ms=round(p99 * 1000, 1) if p99 is not None else None,
+        peak_rss_mb=peak_rss_mb(),
+    )))
+
+
+# --- Parent side: archives, mock server, one child per mode, report ---
+
+def make_certificate(workdir):
+    cert, key = os.path.join(workdir, "mock_x.crt"), os.path.join(workdir, "mock_x.key")
+    if not (os.path.exists(cert) and os.path.exists(key)):
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "30",
+             "-subj", "/CN=x.com", "-keyout", key, "-out", cert],
+            check=True, capture_output=True,
+        )
+    return cert, key
+
+
+def start_mock(args, tls):
+    command = [sys.executable, os.path.join(BENCH_DIR, "mock_x.py"), "--mix", args.mix,
+               "--latency", str(args.latency), "--jitter", str(args.jitter), "--hops", str(args.hops)]
+    if tls:
+        cert, key = make_certificate(args.workdir)
+        command += ["--tls-port", "0", "--cert", cert, "--key", key]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    ports = [int(port) for port in process.stdout.readline().split()]
+    if not ports:
+        process.kill()
+        raise RuntimeError("mock_x.py did not start")
+    return process, ports[0], (ports[1] if tls else None)
+
+
+def archive_for(size, workdir):
+    path = os.path.join(workdir, f"follower-{size}.js")
+    if not os.path.exists(path):
+        write_archive(path, size)
+    return path
+
+
+def run_mode(args, mode, archive, port, tls_port):
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", mode, "--archive", archive,
+        "--mock-url", f"http://127.0.0.1:{port}", "--concurrency", str(args.concurrency),
+        "--browser-limit", str(args.browser_limit), "--tabs", str(args.tabs),
+        "--debugging-port", str(args.debugging_port),
+    ]
+    if tls_port:
+        command += ["--tls-port", str(tls_port)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        error = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+        return {"error": error}
+    return json.loads(lines[-1])
+
+
+def format_row(cells, widths):
+    return "  ".join(str(cell).rjust(width) if index else str(cell).ljust(width)
+                     for index, (cell, width) in enumerate(zip(cells, widths)))
+
+
+def print_report(results, baseline=None, threshold=DEFAULT_THRESHOLD):
+    header = ("mode", "size", "ids", "ids/sec", "p50 ms", "p99 ms", "resolved", "correct", "rss MB", "handoff",
+              "vs baseline")
+    rows = []
+    regressions = []
+    for result in results:
+        key = f"{result['mode']}@{result['size']}"
+        if "error" in result:
+            rows.append((result["mode"], result["size"], "-", "-", "-", "-", "-", "-", "-", "-", f"error: {result['error'][:ERROR_WIDTH]}"))
+            continue
+        ids = result["ids"] or 1
+        change = ""
+        previous = (baseline or {}).get(key)
+        if previous and "error" not in previous and previous.get("ids_per_sec"):
+            speed = result["ids_per_sec"] / previous["ids_per_sec"] - 1
+            change = f"{speed:+.1%} ids/sec"
+            slower = speed < -threshold
+            if result.get("p99_ms") and previous.get("p99_ms"):
+                tail = result["p99_ms"] / previous["p99_ms"] - 1
+                change += f", {tail:+.1%} p99"
+                slower = slower or tail > threshold
+            if slower:
+                change += "  REGRESSION"
+                regressions.append(key)
+        rows.append((
+            result["mode"], result["size"], result["ids"], result["ids_per_sec"],
+            result["p50_ms"] if result["p50_ms"] is not None else "-",
+            result["p99_ms"] if result["p99_ms"] is not None else "-",
+            f"{result['resolved'] / ids:.0%}", f"{result['correct'] / ids:.0%}", result["peak_rss_mb"],
+            f"after {result['handoff_after']}" if result.get("handoff_after") is not None else "-", change,
+        ))
+    widths = [max(len(str(row[index])) for row in rows + [header]) for index in range(len(header))]
+    print(format_row(header, widths))
+    for row in rows:
+        print(format_row(row, widths))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the resolver modes against a local mock of X")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="archive sizes to generate and run, from 100 up to 1000000")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["parse", "http"])
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="mock scenario weights")
+    parser.add_argument("--latency", type=float, default=20.0, help="mock latency per request, in ms")
+    parser.add_argument("--jitter", type=float, default=10.0, help="mock latency jitter, in ms")
+    parser.add_argument("--hops", type=int, default=DEFAULT_HOPS, help="redirects in a chain scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="HTTP fast path concurrency")
+    parser.add_argument("--browser-limit", type=int, default=DEFAULT_BROWSER_LIMIT,
+                        help="links visited per archive in the browser modes")
+    parser.add_argument("--tabs", type=int, default=4, help="tabs in the tabs mode")
+    parser.add_argument("--debugging-port", type=int, default=9322, help="Chrome remote debugging port")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="where generated archives are kept")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per mode and size; the fastest is kept")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression by --compare")
+    parser.add_argument("--output", help="write the results as JSON, for a later --compare")
+    parser.add_argument("--compare", help="results JSON of an earlier run to flag regressions against")
+    # Internal: run a single mode in this process
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--archive", help=argparse.SUPPRESS)
+    parser.add_argument("--mock-url", help=argparse.SUPPRESS)
+    parser.add_argument("--tls-port", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        run_child(args)
+        return 0
+
+    os.makedirs(args.workdir, exist_ok=True)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = {f"{result['mode']}@{result['size']}": result for result in json.load(file)["results"]}
+
+    tls = any(mode in BROWSER_MODES for mode in args.modes)
+    mock, port, tls_port = start_mock(args, tls)
+    results = []
+    try:
+        for size in args.sizes:
+            archive = archive_for(size, args.workdir)
+            for mode in args.modes:
+                print(f"Running {mode} on {size} entries...", file=sys.stderr, flush=True)
+                runs = [run_mode(args, mode, archive, port, tls_port) for _ in range(max(1, args.repeat))]
+                best = max(runs, key=lambda run: run.get("ids_per_sec") or 0)
+                results.append(dict(best, mode=mode, size=size))
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    regressions = print_report(results, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "settings": {"mix": args.mix, "latency_ms": args.latency, "jitter_ms": args.jitter,
+                             "hops": args.hops, "concurrency": args.concurrency, "browser_limit": args.browser_limit},
+                "results": results,
+            }, file, indent=2)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from engine import (
+    PAGE_CANDIDATES_SCRIPT, PAGE_CONTENT_TIMEOUT, TIMEOUT, UNPARSEABLE, ERROR, method_stats, read_page,
+)
+from metrics import metrics
+from x_urls import (
+    username_from_url, ERROR_PAGE_SCRIPT,
+    REDIRECT_TIMEOUT, REDIRECT_SETTLE,
+)
+
+# aiohttp provides the DevTools websocket client; tab mode is unavailable without it
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_TABS = 4
+COMMAND_TIMEOUT = 30  # Seconds to wait for a DevTools command reply
+NAVIGATION_TIMEOUT = 30  # Seconds before a navigation counts as timed out
+
+
+def is_available():
+    return aiohttp is not None
+
+
+class CdpError(Exception):
+    """A DevTools command returned an error"""
+
+
+class CdpConnection:
+    """A single browser-level DevTools websocket shared by all tabs of one Chrome
+
+    Uses flattened target sessions, so commands and events for every tab are
+    multiplexed over this one connection by sessionId.
+    """
+
+    def __init__(self, websocket_url):
+        self.websocket_url = websocket_url
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = {}
+        self._http = None
+        self._ws = None
+        self._reader = None
+
+    async def connect(self):
+        self._http = aiohttp.ClientSession()
+        self._ws = await self._http.ws_connect(self.websocket_url, max_msg_size=0)
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            async for message in self._ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if "id" in data:
+                    future = self._pending.pop(data["id"], None)
+                    if future and not future.done():
+                        if "error" in data:
+                            future.set_exception(CdpError(data["error"].get("message", data["error"])))
+                        else:
+                            future.set_result(data.get("result", {}))
+                elif data.get("sessionId") in self._listeners:
+                    self._listeners[data["sessionId"]].put_nowait(data)
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CdpError("DevTools connection closed"))
+            self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        message_id = next(self._ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        await self._ws.send_str(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(message_id, None)
+
+    def listen(self, session_id):
+        """Return a queue receiving every event of one target session"""
+        queue = asyncio.Queue()
+        self._listeners[session_id] = queue
+        return queue
+
+    def forget(self, session_id):
+        self._listeners.pop(session_id, None)
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        if self._http is not None:
+            await self._http.close()
+
+
+class CdpTab:
+    """One browser tab driven through its own flattened DevTools session"""
+
+    def __init__(self, connection, target_id, session_id, events):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.events = events
+
+    @classmethod
+    async def open(cls, connection, blocked_urls=None):
+        target = await connection.send("Target.createTarget", {"url": "about:blank"})
+        attached = await connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        tab = cls(connection, target["targetId"], attached["sessionId"], connection.listen(attached["sessionId"]))
+        await tab.send("Page.enable")
+        if blocked_urls:
+            await tab.send("Network.enable")
+            await tab.send("Network.setBlockedURLs", {"urls": list(blocked_urls)})
+        return tab
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, session_id=self.session_id, timeout=timeout)
+
+    async def evaluate(self, expression):
+        result = await self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        return result.get("result", {}).get("value")
+
+    async def navigate(self, url, timeout=REDIRECT_TIMEOUT, settle=REDIRECT_SETTLE):
+        """Navigate and return the final URL, driven by navigation events instead of polling
+
+        Finishes as soon as the URL names an account, once the page has loaded
+        and the URL stayed unchanged for ``settle`` seconds, or after ``timeout``
+        seconds of redirects.
+        """
+        while not self.events.empty():
+            self.events.get_nowait()
+
+        result = await self.send("Page.navigate", {"url": url}, timeout=NAVIGATION_TIMEOUT)
+        if result.get("errorText"):
+            raise CdpError(f"Navigation failed: {result['errorText']}")
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        current_url = url
+        last_change = started
+        loaded = False
+        while True:
+            if username_from_url(current_url)[0]:
+                return current_url
+            now = loop.time()
+            if now - started >= timeout:
+                return current_url
+            if loaded and now - last_change >= settle:
+                return current_url
+
+            wait = timeout - (now - started)
+            if loaded:
+                wait = min(wait, settle - (now - last_change))
+            try:
+                event = await asyncio.wait_for(self.events.get(), wait)
+            except asyncio.TimeoutError:
+                continue
+
+            method, params = event.get("method"), event.get("params", {})
+            if method == "Page.frameNavigated" and not params.get("frame", {}).get("parentId"):
+                frame = params["frame"]
+                current_url = frame["url"] + frame.get("urlFragment", "")
+                last_change = loop.time()
+                loaded = False
+            elif method == "Page.navigatedWithinDocument":
+                current_url = params["url"]
+                last_change = loop.time()
+            elif method in ("Page.domContentEventFired", "Page.loadEventFired"):
+                loaded = True
+
+    async def close(self):
+        self.connection.forget(self.session_id)
+        try:
+            await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+        except Exception as e:
+            logger.debug(f"Could not close tab {self.target_id}: {e}")
+
+
+class TabMultiplexer:
+    """Resolve URLs in K tabs of one logged-in browser on a private asyncio loop
+
+    ``resolve`` is blocking and thread-safe: up to K callers run concurrently,
+    each borrowing a free tab. The extraction rules are the same as
+    get_username_from_url's: URL patterns, error pages, then page candidates.
+    """
+
+    def __init__(self, driver, tabs=DEFAULT_TABS, blocked_urls=None):
+        self.tabs = max(1, int(tabs))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="cdp-tabs", daemon=True)
+        self._thread.start()
+        try:
+            self._call(self._start(debugger_address(driver), blocked_urls))
+        except Exception:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            raise
+        logger.info(f"Opened {self.tabs} DevTools tabs in browser at {debugger_address(driver)}")
+
+    def _call(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    async def _start(self, address, blocked_urls):
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"http://{address}/json/version") as response:
+                version = await response.json(content_type=None)
+        self._connection = CdpConnection(version["webSocketDebuggerUrl"])
+        await self._connection.connect()
+        self._free_tabs = asyncio.Queue()
+        for _ in range(self.tabs):
+            self._free_tabs.put_nowait(await CdpTab.open(self._connection, blocked_urls))
+
+    async def _read_page(self, tab):
+        # The title is a bare "X" long before the profile or an error page renders, so poll for either
+        expression = f"(function () {{{PAGE_CANDIDATES_SCRIPT}}}).apply(null, {json.dumps([method_stats.ordered_sources()])})"
+        deadline = time.monotonic() + PAGE_CONTENT_TIMEOUT
+        while True:
+            found = read_page(await tab.evaluate(ERROR_PAGE_SCRIPT), await tab.evaluate(expression))
+            if found or time.monotonic() >= deadline:
+                return found or (None, None)
+            await asyncio.sleep(0.25)
+
+    async def _extract(self, tab, url, final_url):
+        # Pattern 1 (?screen_name=USERNAME) and Pattern 2 (x.com/USERNAME)
+        username, method = username_from_url(final_url)
+        if username:
+            return username, method
+
+        # Pattern 3: page-content candidates, or whichever error page X serves first
+        username, source = await self._read_page(tab)
+        if username:
+            return username, source
+        if source:
+            logger.warning(f"X served a {source} page for URL: {url}")
+            return None, source
+        logger.warning(f"Could not extract username from URL: {final_url}")
+        return None, UNPARSEABLE
+
+    async def _resolve(self, url):
+        tab = await self._free_tabs.get()
+        try:
+            # Navigation and redirect settling are one event-driven wait here, so both count as
+            # navigate; spans are observed directly because every tab shares this loop thread
+            started = time.perf_counter()
+            final_url = await tab.navigate(url)
+            metrics.observe("phase_seconds", time.perf_counter() - started, phase="navigate")
+            logger.debug(f"Final URL: {final_url}")
+
+            started = time.perf_counter()
+            try:
+                return await self._extract(tab, url, final_url)
+            finally:
+                metrics.observe("phase_seconds", time.perf_counter() - started, phase="extract")
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out processing URL {url}")
+            return None, TIMEOUT
+        except Exception as e:
+            logger.error(f"Error processing URL {url}: {e}")
+            return None, ERROR
+        finally:
+            self._free_tabs.put_nowait(tab)
+
+    def resolve(self, url):
+        """Resolve one URL in the next free tab; returns (username, method) like get_username_from_url"""
+        logger.debug(f"Processing URL: {url}")
+        return self._call(self._resolve(url))
+
+    async def _close(self):
+        while not self._free_tabs.empty():
+            await self._free_tabs.get_nowait().close()
+        await self._connection.close()
+
+    def close(self):
+        try:
+            self._call(self._close(), timeout=COMMAND_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Error closing DevTools tabs: {e}")
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+def debugger_address(driver):
+    """Return host:port of the DevTools endpoint chromedriver opened for this browser"""
+    return driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_JOURNAL_FILE = "progress_journal.tsv"
+DEFAULT_SYNC_EVERY = 100  # Records between fsyncs
+DEFAULT_SYNC_INTERVAL = 5.0  # Maximum seconds between fsyncs
+
+OUTCOME_DONE = "done"
+OUTCOME_FAILED = "failed"
+
+
+def journal_key(account_id, url):
+    """Key an entry by its account ID, falling back to the link itself"""
+    return str(account_id) if account_id is not None else url
+
+
+class Journal:
+    """Append-only, batch-fsynced record of the outcome of every processed account
+
+    Each line is ``key<TAB>outcome<TAB>detail``. A resumed run skips every key
+    with an outcome; anything that was still in flight when the previous run
+    died has no outcome yet and is simply processed again.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_FILE, resume=False,
+                 sync_every=DEFAULT_SYNC_EVERY, sync_interval=DEFAULT_SYNC_INTERVAL, before_sync=None):
+        self.path = path
+        # Called before every fsync so outputs are never behind the journal on disk
+        self.before_sync = before_sync
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.completed = self.load(path) if resume else {}
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._file.tell() and not self._ends_with_newline(path):
+            # Terminate a torn last line so new records start cleanly
+            self._file.write("\n")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        if resume:
+            logger.info(f"Resuming from {path}: {len(self.completed)} accounts already processed")
+
+    @staticmethod
+    def load(path):
+        """Return {key: outcome} for every complete line in an existing journal"""
+        completed = {}
+        if not os.path.exists(path):
+            return completed
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                # A crash can leave a torn last line; it has no newline and is ignored
+                if not line.endswith("\n"):
+                    break
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) >= 2 and fields[1] in (OUTCOME_DONE, OUTCOME_FAILED):
+                    completed[fields[0]] = fields[1]
+        return completed
+
+    @staticmethod
+    def _ends_with_newline(path):
+        with open(path, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b"\n"
+
+    def is_completed(self, key):
+        return key in self.completed
+
+    def record(self, key, outcome, detail=""):
+        """Append the outcome for ``key``; fsynced in batches"""
+        with self._lock:
+            self._file.write(f"{key}\t{outcome}\t{detail}\n")
+            self.completed[key] = outcome
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        if self.before_sync:
+            self.before_sync()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
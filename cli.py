@@ -0,0 +1,287 @@
+"""One entry point for every task: python cli.py <command> [options]
+
+  resolve     resolve the archive to usernames (what main.py does)
+  retry       retry dead-lettered links (what retry_failed_urls.py does)
+  status      how far the run has got and how many accounts are left
+  export      write the latest username of every resolved account
+  lookup      show what is known about one or more account IDs
+
+Only resolve and retry import Selenium and start browsers; status, export and
+lookup answer from the files earlier runs left behind.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from collections import Counter
+from archive_reader import expand_archive_paths, iter_user_links, DEFAULT_ARCHIVE_FILE
+from checkpoint import Journal, DEFAULT_JOURNAL_FILE, OUTCOME_DONE, OUTCOME_FAILED
+from dead_letter import read_dead_letter, dead_letter_path
+from id_set import CompactIdSet
+from result_writer import read_latest_results, detect_format, DEFAULT_OUTPUT_FILE, RESULT_FIELDS
+from settings import read_config, load_config, CONFIG_FILE
+from username_cache import UsernameCache, DEFAULT_CACHE_FILE
+from work_queue import read_queue_status, iter_queue_results, DEFAULT_QUEUE_FILE
+from x_urls import parse_account_id
+
+logger = logging.getLogger('follower_extractor')
+
+
+def apply_overrides(config, args):
+    """Point the config at the archive and output files given on the command line"""
+    if args.archive:
+        config['archive'] = dict(config.get('archive') or {}, paths=args.archive)
+    if args.output:
+        config['output'] = dict(config.get('output') or {}, path=args.output)
+    return config
+
+
+def output_path(config):
+    return (config.get('output') or {}).get('path', DEFAULT_OUTPUT_FILE)
+
+
+def archive_paths(config):
+    return (config.get('archive') or {}).get('paths') or [DEFAULT_ARCHIVE_FILE]
+
+
+def queue_path(config):
+    return (config.get('work_queue') or {}).get('path', DEFAULT_QUEUE_FILE)
+
+
+def cache_path(config):
+    return (config.get('cache') or {}).get('path', DEFAULT_CACHE_FILE)
+
+
+def read_failures(config):
+    """Return {account_id: reason} from the dead letter file, the latest row winning"""
+    path = dead_letter_path(config)
+    failures = {}
+    if os.path.exists(path):
+        for row in read_dead_letter(path):
+            account_id = parse_account_id(row["url"])
+            if account_id is not None:
+                failures[account_id] = row["reason"]
+    return failures
+
+
+def command_resolve(args):
+    # Importing main keeps the resolve code in one place; it pulls in the engine lazily
+    import main
+    main.setup_logging()
+    logger.info("============ FOLLOWER EXTRACTOR STARTED ============")
+    try:
+        main.resolve(apply_overrides(load_config(args.config), args), args)
+    except Exception as e:
+        logger.error(f"Fatal error: {e}")
+        return 1
+    finally:
+        logger.info("============ FOLLOWER EXTRACTOR FINISHED ============")
+    return 0
+
+
+def command_retry(args):
+    import retry_failed_urls
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        retry_failed_urls.retry(apply_overrides(load_config(args.config), args), include_permanent=args.all)
+    except Exception as e:
+        logger.error(f"Retry run failed, its links stay in the dead letter file: {e}")
+        return 1
+    return 0
+
+
+def collect_status(config, count_archive=True):
+    """Count what the outputs of earlier runs hold, and what is left of the archive"""
+    status = {}
+    results_file = output_path(config)
+    resolved = read_latest_results(results_file) if os.path.exists(results_file) else {}
+    failures = read_failures(config)
+    status['resolved'] = len(resolved)
+    status['failed'] = len([account_id for account_id in failures if account_id not in resolved])
+    status['failure_reasons'] = dict(Counter(
+        reason for account_id, reason in failures.items() if account_id not in resolved
+    ).most_common())
+
+    journal_path = (config.get('checkpoint') or {}).get('path', DEFAULT_JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        outcomes = Counter(Journal.load(journal_path).values())
+        status['journal'] = {'done': outcomes[OUTCOME_DONE], 'failed': outcomes[OUTCOME_FAILED]}
+
+    if count_archive:
+        paths = [path for path in expand_archive_paths(archive_paths(config)) if os.path.exists(path)]
+        if paths:
+            # Same dedupe as the engine's pre-pass, so the numbers add up
+            archive_ids = CompactIdSet()
+            for account_id, _ in iter_user_links(paths):
+                if account_id is not None:
+                    archive_ids.add(account_id)
+            finished = sum(1 for account_id in set(resolved) | set(failures) if account_id in archive_ids)
+            status['archive'] = len(archive_ids)
+            status['left'] = len(archive_ids) - finished
+
+    if os.path.exists(queue_path(config)):
+        # Read-only: the file may be shared with hosts that are still working on it
+        queue_status = read_queue_status(queue_path(config))
+        status['work_queue'] = {'chunks': queue_status['chunks'], 'items': queue_status['items']}
+
+    if os.path.exists(cache_path(config)):
+        cache = UsernameCache(cache_path(config), ttl_days=None)
+        try:
+            status['cached'] = cache.count()
+        finally:
+            cache.close()
+    return status
+
+
+def command_status(args):
+    config = apply_overrides(read_config(args.config), args)
+    status = collect_status(config, count_archive=not args.no_archive)
+    if args.json:
+        print(json.dumps(status, indent=2))
+        return 0
+
+    if 'archive' in status:
+        print(f"Archive:    {status['archive']} accounts")
+    print(f"Resolved:   {status['resolved']} ({output_path(config)})")
+    reasons = ", ".join(f"{reason} {count}" for reason, count in status['failure_reasons'].items())
+    print(f"Failed:     {status['failed']}" + (f" ({reasons})" if reasons else ""))
+    if 'left' in status:
+        print(f"Left:       {status['left']}")
+    if 'journal' in status:
+        print(f"Journal:    {status['journal']['done']} done, {status['journal']['failed']} failed")
+    if 'work_queue' in status:
+        chunks = ", ".join(f"{count} {state}" for state, count in sorted(status['work_queue']['chunks'].items()))
+        items = ", ".join(f"{count} {state}" for state, count in sorted(status['work_queue']['items'].items()))
+        print(f"Work queue: chunks {chunks or 'none'}; accounts {items or 'none'}")
+    if 'cached' in status:
+        print(f"Cache:      {status['cached']} usernames")
+    return 0
+
+
+def command_export(args):
+    config = apply_overrides(read_config(args.config), args)
+    latest = {}
+    results_file = output_path(config)
+    if os.path.exists(results_file):
+        latest.update(read_latest_results(results_file))
+    queue_file = args.queue or queue_path(config)
+    if args.queue and not os.path.exists(queue_file):
+        print(f"No work queue at {queue_file}", file=sys.stderr)
+        return 2
+    if os.path.exists(queue_file):
+        # Other hosts' results only live in the shared queue; read-only, as they may still be working on it
+        for account_id, _, state, username, method in iter_queue_results(queue_file):
+            if state == OUTCOME_DONE and account_id is not None and username:
+                latest.setdefault(account_id, (username, method, None, None))
+
+    destination = args.destination
+    fmt = args.format or (detect_format(destination) if destination != "-" else "csv")
+    file = sys.stdout if destination == "-" else open(destination, "w", encoding="utf-8", newline="")
+    try:
+        writer = csv.writer(file, lineterminator="\n") if fmt == "csv" else None
+        if writer:
+            writer.writerow(RESULT_FIELDS)
+        for account_id, (username, method, elapsed_ms, timestamp) in latest.items():
+            row = (account_id, username, method, None if elapsed_ms is None else round(elapsed_ms), timestamp)
+            if writer:
+                writer.writerow(["" if value is None else value for value in row])
+            else:
+                file.write(json.dumps(dict(zip(RESULT_FIELDS, row)), ensure_ascii=False) + "\n")
+    finally:
+        if file is not sys.stdout:
+            file.close()
+    if destination != "-":
+        print(f"Exported {len(latest)} accounts to {destination}", file=sys.stderr)
+    return 0
+
+
+def command_lookup(args):
+    config = apply_overrides(read_config(args.config), args)
+    account_ids = []
+    for value in args.account_ids:
+        account_id = int(value) if value.isdigit() else parse_account_id(value)
+        if account_id is None:
+            print(f"{value}: not an account ID or user link", file=sys.stderr)
+            return 2
+        account_ids.append(account_id)
+
+    found = {}
+    if os.path.exists(cache_path(config)):
+        cache = UsernameCache(cache_path(config), ttl_days=None)
+        try:
+            for account_id in account_ids:
+                cached = cache.get(account_id)
+                if cached:
+                    found[account_id] = (cached[0], cached[1], "cache")
+        finally:
+            cache.close()
+    missing = [account_id for account_id in account_ids if account_id not in found]
+    results_file = output_path(config)
+    if missing and os.path.exists(results_file):
+        latest = read_latest_results(results_file)
+        for account_id in missing:
+            if account_id in latest:
+                found[account_id] = (latest[account_id][0], latest[account_id][1], results_file)
+    failures = read_failures(config) if len(found) < len(account_ids) else {}
+
+    for account_id in account_ids:
+        if account_id in found:
+            username, method, source = found[account_id]
+            print(f"{account_id}\t@{username}\t{method or ''}\t{source}")
+        elif account_id in failures:
+            print(f"{account_id}\t-\tfailed: {failures[account_id]}\t{dead_letter_path(config)}")
+        else:
+            print(f"{account_id}\t-\tunknown")
+    return 0 if len(found) == len(account_ids) else 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve X account IDs from an archive to usernames")
+    parser.add_argument("--config", default=CONFIG_FILE, help=f"config file (default: {CONFIG_FILE})")
+    parser.add_argument("--archive", action="append", metavar="PATH",
+                        help="archive file, directory or glob; repeat for several (default: archive.paths)")
+    parser.add_argument("--output", metavar="PATH", help="results file (default: output.path)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # The option helpers live next to the code they drive; importing them does not load Selenium
+    from main import add_resolve_arguments
+    from retry_failed_urls import add_retry_arguments
+    resolve = commands.add_parser("resolve", help="resolve the archive to usernames")
+    add_resolve_arguments(resolve)
+    resolve.set_defaults(handler=command_resolve)
+
+    retry = commands.add_parser("retry", help="retry dead-lettered links")
+    add_retry_arguments(retry)
+    retry.set_defaults(handler=command_retry)
+
+    status = commands.add_parser("status", help="show progress from existing outputs, without a browser")
+    status.add_argument("--json", action="store_true", help="print machine-readable JSON")
+    status.add_argument("--no-archive", action="store_true", help="skip reading the archive to count what is left")
+    status.set_defaults(handler=command_status)
+
+    export = commands.add_parser("export", help="write the latest username of every resolved account")
+    export.add_argument("destination", nargs="?", default="-", help="file to write, or - for stdout (default)")
+    export.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension, csv on stdout")
+    export.add_argument("--queue", metavar="PATH", help="also export results from this shared work queue")
+    export.set_defaults(handler=command_export)
+
+    lookup = commands.add_parser("lookup", help="show what is known about account IDs")
+    lookup.add_argument("account_ids", nargs="+", metavar="ID", help="account ID or user link")
+    lookup.set_defaults(handler=command_lookup)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # Output piped into a reader that stopped early, e.g. `export | head`
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
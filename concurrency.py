@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from collections import deque
+from statistics import median
+from x_urls import RATE_LIMITED
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_WINDOW = 50  # Recent resolutions the success rate and latency are measured over
+DEFAULT_MIN_SUCCESS_RATE = 0.9  # No increase while fewer resolutions than this succeed
+DEFAULT_LATENCY_FACTOR = 2.0  # No increase while the median latency is this many times the baseline
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_RATE_STEP = 0.1  # Share of an account's configured rate added per healthy round while it holds workers back
+DEFAULT_MAX_RATE_FACTOR = 1.0  # Rates are raised to at most this multiple of the configured rate...
+DEFAULT_MIN_RATE_FACTOR = 0.25  # ...and cut to no less than this share of it
+BASELINE_DRIFT = 1.05  # Lets the latency baseline creep up once per round when X stays slower for good
+
+
+class _ManagedRate:
+    """An account's token bucket whose rate the controller raises and cuts"""
+
+    def __init__(self, limiter, step_factor, max_factor, min_factor):
+        self.limiter = limiter
+        self.configured = limiter.rate
+        self.step = limiter.rate * step_factor
+        self.max_rate = limiter.rate * max_factor
+        self.min_rate = limiter.rate * min_factor
+        self.peak = limiter.rate
+        self.waits_seen = limiter.waits
+        self.last_cut = float('-inf')
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of links resolved at the same time and on the request rate
+
+    Workers take a slot before each visit. While the recent success rate is
+    high and latency stays near the best seen so far, the limit grows by one
+    for every ``limit`` healthy resolutions, i.e. about once per round of
+    in-flight work. A rate-limit page, timeout or challenge cuts the limit by
+    ``decrease_factor``; signals from visits that started before the last cut
+    are ignored, so one burst of 429s only counts once.
+
+    The accounts' token buckets (``limiters``) get the same treatment: every
+    healthy round raises the rate of each bucket that kept workers waiting by
+    ``rate_step`` of its configured rate, up to ``max_rate_factor`` times it
+    (by default the configured rate itself), and a timeout or challenge cuts
+    the rate of the bucket that saw it, down to ``min_rate_factor`` of it. A
+    rate-limit page is left to the bucket's own backoff, which already halves
+    the rate.
+    """
+
+    def __init__(self, max_limit, initial=None, min_limit=DEFAULT_MIN_LIMIT, window=DEFAULT_WINDOW,
+                 min_success_rate=DEFAULT_MIN_SUCCESS_RATE, latency_factor=DEFAULT_LATENCY_FACTOR,
+                 decrease_factor=DEFAULT_DECREASE_FACTOR, limiters=(), rate_step=DEFAULT_RATE_STEP,
+                 max_rate_factor=DEFAULT_MAX_RATE_FACTOR, min_rate_factor=DEFAULT_MIN_RATE_FACTOR):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = min(self.max_limit, max(self.min_limit, int(initial or (self.max_limit + 1) // 2)))
+        self.min_success_rate = min_success_rate
+        self.latency_factor = latency_factor
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak = self.limit
+        self._rates = {
+            id(limiter): _ManagedRate(limiter, rate_step, max_rate_factor, min_rate_factor) for limiter in limiters
+        }
+        self._outcomes = deque(maxlen=max(1, int(window)))
+        self._latencies = deque(maxlen=max(1, int(window)))
+        self._baseline = None
+        self._healthy_since_change = 0
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+        logger.info(f"Adaptive concurrency: starting at {self.limit} of {self.max_limit} in-flight resolutions")
+
+    def acquire(self):
+        """Block until a slot is free; returns the start time to pass to ``release``"""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, healthy, congested, latency=None, limiter=None):
+        """Free a slot and adjust the limits from how the visit went
+
+        ``congested`` is a rate limit, timeout or challenge; ``healthy`` is any
+        answer that says the request itself went through, ``latency`` its
+        duration in seconds and ``limiter`` the token bucket it was sent under.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self._outcomes.append(bool(healthy))
+            if healthy and latency is not None:
+                self._latencies.append(latency)
+            if congested:
+                if started >= self._last_decrease:
+                    self._decrease(congested)
+                # The bucket halves its own rate on a 429; cutting it here as well would quarter it
+                managed = self._rates.get(id(limiter)) if congested != RATE_LIMITED else None
+                if managed is not None and started >= managed.last_cut:
+                    self._cut_rate(managed, congested)
+            elif healthy:
+                self._healthy_since_change += 1
+                if self._healthy_since_change >= self.limit:
+                    self._maybe_increase()
+            self._condition.notify_all()
+
+    def _latency_state(self):
+        if len(self._latencies) < self._latencies.maxlen // 2:
+            return None, self._baseline
+        current = median(self._latencies)
+        # The best median seen approximates the latency of an uncongested X
+        self._baseline = current if self._baseline is None else min(self._baseline * BASELINE_DRIFT, current)
+        return current, self._baseline
+
+    def _maybe_increase(self):
+        self._healthy_since_change = 0
+        success_rate = sum(self._outcomes) / len(self._outcomes)
+        current, baseline = self._latency_state()
+        if success_rate < self.min_success_rate:
+            return
+        if current is not None and current > baseline * self.latency_factor:
+            logger.info(
+                f"Concurrency held at {self.limit}: median latency {current:.2f}s is above "
+                f"{self.latency_factor:g}x the {baseline:.2f}s baseline"
+            )
+            return
+        self._raise_rates()
+        if self.limit >= self.max_limit:
+            return
+        self.limit += 1
+        self.increases += 1
+        self.peak = max(self.peak, self.limit)
+        latency = f", median latency {current:.2f}s" if current is not None else ""
+        logger.info(f"Concurrency raised to {self.limit} (success rate {success_rate:.0%}{latency})")
+
+    def _raise_rates(self):
+        for managed in self._rates.values():
+            limiter = managed.limiter
+            # Only a bucket that made workers wait is holding throughput back
+            binding = limiter.waits > managed.waits_seen
+            managed.waits_seen = limiter.waits
+            if not binding or limiter.rate >= managed.max_rate:
+                continue
+            rate = min(managed.max_rate, limiter.rate + managed.step)
+            limiter.set_rate(rate)
+            managed.peak = max(managed.peak, rate)
+            logger.info(f"Request rate raised to {rate:.3f} req/s")
+
+    def _decrease(self, reason):
+        self._last_decrease = time.monotonic()
+        self._healthy_since_change = 0
+        limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        if limit == self.limit:
+            return
+        logger.warning(f"Concurrency cut from {self.limit} to {limit} after {reason}")
+        self.limit = limit
+        self.decreases += 1
+
+    def _cut_rate(self, managed, reason):
+        managed.last_cut = time.monotonic()
+        limiter = managed.limiter
+        rate = max(managed.min_rate, limiter.rate * self.decrease_factor)
+        # Waits before the cut say nothing about the new rate
+        managed.waits_seen = limiter.waits
+        if rate < limiter.rate:
+            logger.warning(f"Request rate cut from {limiter.rate:.3f} to {rate:.3f} req/s after {reason}")
+            limiter.set_rate(rate)
+
+    def report(self):
+        logger.info(
+            f"Adaptive concurrency: ended at {self.limit} (peak {self.peak}), "
+            f"{self.increases} increase(s), {self.decreases} cut(s)"
+        )
+        for managed in self._rates.values():
+            logger.info(
+                f"Adaptive rate: ended at {managed.limiter.rate:.3f} req/s (peak {managed.peak:.3f}, "
+                f"configured {managed.configured:.3f})"
+            )
+
+
+def load_concurrency(config, max_limit, limiters=()):
+    """Create the adaptive controller configured in config.yml, or None when it is disabled
+
+    ``limiters`` are the token buckets of the accounts in use; with a single
+    worker the controller still tunes their rates.
+    """
+    concurrency_config = config.get('concurrency') or {}
+    if not concurrency_config.get('enabled', True) or (max_limit <= 1 and not limiters):
+        return None
+    return AdaptiveConcurrency(
+        max_limit,
+        initial=concurrency_config.get('initial'),
+        min_limit=concurrency_config.get('min', DEFAULT_MIN_LIMIT),
+        window=concurrency_config.get('window', DEFAULT_WINDOW),
+        min_success_rate=concurrency_config.get('min_success_rate', DEFAULT_MIN_SUCCESS_RATE),
+        latency_factor=concurrency_config.get('latency_factor', DEFAULT_LATENCY_FACTOR),
+        decrease_factor=concurrency_config.get('decrease_factor', DEFAULT_DECREASE_FACTOR),
+        limiters=limiters if concurrency_config.get('adapt_rate', True) else (),
+        rate_step=concurrency_config.get('rate_step', DEFAULT_RATE_STEP),
+        max_rate_factor=concurrency_config.get('max_rate_factor', DEFAULT_MAX_RATE_FACTOR),
+        min_rate_factor=concurrency_config.get('min_rate_factor', DEFAULT_MIN_RATE_FACTOR),
+    )
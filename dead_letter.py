@@ -0,0 +1,60 @@
+import csv
+import os
+import time
+from x_urls import parse_account_id, SUSPENDED, NOT_FOUND
+
+DEAD_LETTER_FILE = "dead_letter.csv"
+# Failures that go straight to the dead letter file and are only retried on request
+PERMANENT_FAILURES = {SUSPENDED, NOT_FOUND}
+DEAD_LETTER_FIELDS = ("account_id", "url", "reason", "attempts", "timestamp")
+
+
+def read_dead_letter(path=DEAD_LETTER_FILE):
+    """Yield the rows of a dead letter file as dicts"""
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        yield from csv.DictReader(file)
+
+
+def rewrite_dead_letter(path, rows):
+    """Replace the dead letter file with ``rows`` as read by read_dead_letter, swapping it in atomically"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, DEAD_LETTER_FIELDS, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temp_path, path)
+
+
+class DeadLetterFile:
+    """CSV of links that will not be retried in this run, with the reason and attempt count"""
+
+    def __init__(self, path=DEAD_LETTER_FILE, append=False):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+        if self._file.tell() == 0:
+            self._writer.writerow(DEAD_LETTER_FIELDS)
+
+    def write(self, url, reason, attempts):
+        account_id = parse_account_id(url)
+        self._writer.writerow([
+            "" if account_id is None else account_id, url, reason, attempts,
+            time.strftime("%Y-%m-%dT%H:%M:%S"),
+        ])
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def dead_letter_path(config):
+    """Return the dead letter file configured in config.yml"""
+    return (config.get('retry') or {}).get('dead_letter_path', DEAD_LETTER_FILE)
+
+
+def load_dead_letter(config, append):
+    """Open the dead letter file configured in config.yml"""
+    return DeadLetterFile(dead_letter_path(config), append=append)
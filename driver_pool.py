@@ -0,0 +1,252 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_WORKERS = 1
+DEFAULT_BASE_PORT = 9222
+COOKIE_DOMAIN_URL = "https://x.com/"
+
+# Sentinel marking the end of the work queue / a finished worker
+_STOP = object()
+
+
+def share_cookies(driver, cookies):
+    """Load the logged-in session cookies into another driver"""
+    # Cookies can only be set for the domain that is currently open
+    driver.get(COOKIE_DOMAIN_URL)
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            logger.warning(f"Could not copy cookie {cookie.get('name')}: {e}")
+    driver.refresh()
+
+
+class WorkerStats:
+    """Per-worker counters reported when the pool finishes"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.processed = 0
+        self.succeeded = 0
+        self.busy_seconds = 0.0
+
+    def urls_per_minute(self):
+        if not self.busy_seconds:
+            return 0.0
+        return self.processed * 60 / self.busy_seconds
+
+
+class DriverPool:
+    """A pool of Chrome drivers that resolve URLs from a shared queue
+
+    Every worker gets its own remote debugging port and profile directory.
+    Only the first driver of each login group logs in; the others reuse its
+    cookies, so groups can belong to different accounts. Results are
+    handed back to the calling thread, which acts as the single writer.
+    ``threads_per_driver`` > 1 lets several threads share one driver, for
+    resolvers that multiplex tabs inside a browser.
+    """
+
+    def __init__(self, driver_factory, size=DEFAULT_WORKERS, base_port=DEFAULT_BASE_PORT, profile_root=None,
+                 threads_per_driver=1):
+        self.driver_factory = driver_factory
+        self.size = max(1, int(size))
+        self.threads_per_driver = max(1, int(threads_per_driver))
+        self._stats_lock = threading.Lock()
+        self.base_port = base_port
+        self.profile_root = profile_root
+        self.drivers = []
+        self.groups = []  # Login group index of every driver
+        self.stats = []
+        self._profile_dirs = []
+        self._temp_dirs = []
+
+    def _profile_dir(self, worker_id):
+        if self.profile_root:
+            path = os.path.join(self.profile_root, f"worker_{worker_id}")
+            os.makedirs(path, exist_ok=True)
+            return path
+        path = tempfile.mkdtemp(prefix=f"x_id2username_worker_{worker_id}_")
+        self._temp_dirs.append(path)
+        return path
+
+    def _create_driver(self, group):
+        worker_id = len(self.drivers)
+        port = self.base_port + worker_id
+        logger.info(f"Starting worker {worker_id} on debugging port {port}")
+        profile_dir = self._profile_dir(worker_id)
+        driver = self.driver_factory(port, profile_dir)
+        self.drivers.append(driver)
+        self._profile_dirs.append(profile_dir)
+        self.groups.append(group)
+        self.stats.append(WorkerStats(worker_id))
+        return driver
+
+    def start(self, login):
+        """Start every driver, logging in once and sharing the session cookies
+
+        ``login`` is called with the first driver and must return True on success.
+        """
+        return self.start_groups([(self.size, login)])[0]
+
+    def start_groups(self, logins):
+        """Start one group of drivers per ``(size, login)`` pair; returns which groups logged in
+
+        Each group logs in on its first driver and shares those cookies with the
+        rest. A group whose login fails is shut down and gets no workers.
+        """
+        started = []
+        for group, (size, login) in enumerate(logins):
+            first = self._create_driver(group)
+            if not login(first):
+                self._discard_last()
+                started.append(False)
+                continue
+            cookies = first.get_cookies()
+            for _ in range(1, max(1, int(size))):
+                share_cookies(self._create_driver(group), cookies)
+            started.append(True)
+        self.size = len(self.drivers)
+        logger.info(f"Driver pool ready with {len(self.drivers)} worker(s)")
+        return started
+
+    def _discard_last(self):
+        driver = self.drivers.pop()
+        self._profile_dirs.pop()
+        self.groups.pop()
+        self.stats.pop()
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing driver: {e}")
+
+    def recycle(self, worker_id, prepare=None):
+        """Replace a worker's driver with a fresh browser on the same port and profile
+
+        ``prepare(driver)``, if given, readies the new driver (e.g. restores the
+        session) before it takes work. Returns the new driver.
+        """
+        old = self.drivers[worker_id]
+        try:
+            old.quit()
+        except Exception as e:
+            logger.warning(f"Error closing driver: {e}")
+        logger.info(f"Restarting the browser of worker {worker_id}")
+        driver = self.driver_factory(self.base_port + worker_id, self._profile_dirs[worker_id])
+        if prepare is not None:
+            prepare(driver)
+        self.drivers[worker_id] = driver
+        return driver
+
+    def _worker(self, worker_id, work, results, resolve, before_take, after_resolve):
+        stats = self.stats[worker_id]
+        try:
+            while True:
+                # Re-read every time: after_resolve may have recycled the driver
+                driver = self.drivers[worker_id]
+                if before_take is not None:
+                    before_take(driver)
+                url = work.get()
+                if url is _STOP:
+                    break
+                started = time.time()
+                try:
+                    result = resolve(driver, url)
+                except Exception as e:
+                    logger.error(f"Worker {worker_id} failed on {url}: {e}")
+                    result = (None, None)
+                elapsed = time.time() - started
+                with self._stats_lock:
+                    stats.busy_seconds += elapsed / self.threads_per_driver
+                    stats.processed += 1
+                    if result[0]:
+                        stats.succeeded += 1
+                results.put((worker_id, url, result, elapsed))
+                if after_resolve is not None:
+                    try:
+                        after_resolve(worker_id, driver, result)
+                    except Exception as e:
+                        logger.error(f"Worker {worker_id} health check failed: {e}")
+        finally:
+            results.put(_STOP)
+
+    def _feed(self, urls, work, errors):
+        try:
+            for url in urls:
+                work.put(url)
+        except BaseException as e:
+            # The feed runs the caller's generators; their errors belong to the caller
+            errors.append(e)
+        finally:
+            for _ in range(len(self.drivers) * self.threads_per_driver):
+                work.put(_STOP)
+
+    def run(self, urls, resolve, on_result, before_take=None, after_resolve=None):
+        """Resolve ``urls`` across all workers
+
+        ``resolve(driver, url)`` runs on worker threads; ``on_result(worker_id, url, result, elapsed)``
+        runs on the calling thread, so it can write output without extra locking.
+        ``before_take(driver)``, if given, blocks a worker until it may take its next URL.
+        ``after_resolve(worker_id, driver, result)``, if given, runs on the worker thread
+        after each URL, e.g. to recycle the driver.
+        An exception raised while iterating ``urls`` stops the workers and is
+        re-raised here once they have finished.
+        """
+        work = queue.Queue(maxsize=len(self.drivers) * self.threads_per_driver * 4)
+        results = queue.Queue()
+        feed_errors = []
+        feeder = threading.Thread(target=self._feed, args=(urls, work, feed_errors), daemon=True)
+        feeder.start()
+
+        threads = []
+        for worker_id in range(len(self.drivers)):
+            for slot in range(self.threads_per_driver):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(worker_id, work, results, resolve, before_take, after_resolve),
+                    name=f"driver-worker-{worker_id}-{slot}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        running = len(threads)
+        while running:
+            item = results.get()
+            if item is _STOP:
+                running -= 1
+                continue
+            on_result(*item)
+
+        for thread in threads:
+            thread.join()
+        feeder.join()
+        if feed_errors:
+            raise feed_errors[0]
+
+    def report(self):
+        """Log per-worker throughput"""
+        for stats in self.stats:
+            logger.info(
+                f"Worker {stats.worker_id}: {stats.processed} processed, {stats.succeeded} resolved, "
+                f"{stats.urls_per_minute():.1f} URLs/min"
+            )
+
+    def close(self):
+        """Quit every driver and remove temporary profile directories"""
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning(f"Error closing driver: {e}")
+        self.drivers = []
+        for path in self._temp_dirs:
+            shutil.rmtree(path, ignore_errors=True)
+        self._temp_dirs = []
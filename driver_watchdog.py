@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+
+# psutil is optional: without it browsers are only recycled by page count and errors
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_MAX_PAGES = 500  # Pages a browser loads before it is replaced with a fresh one
+DEFAULT_MAX_RSS_MB = 1500  # Memory of chromedriver plus every Chrome process it started
+DEFAULT_RSS_CHECK_EVERY = 25  # Pages between memory checks
+DEFAULT_MAX_CONSECUTIVE_ERRORS = 5  # Timeouts or errors in a row before a browser counts as wedged
+DEFAULT_REAUTH_COOLDOWN = 300  # Seconds before retrying a login that failed
+
+# Reasons a browser is recycled
+PAGE_LIMIT = "page_limit"
+MEMORY = "memory"
+WEDGED = "wedged"
+
+
+def browser_rss(driver):
+    """Return the resident memory in bytes of a driver's chromedriver and browser processes, or None"""
+    if psutil is None:
+        return None
+    try:
+        root = psutil.Process(driver.service.process.pid)
+        return sum(process.memory_info().rss for process in [root] + root.children(recursive=True))
+    except (AttributeError, psutil.Error):
+        return None
+
+
+class DriverWatchdog:
+    """Keep long-running browsers healthy
+
+    Counts the pages every driver loads and says when it should be replaced:
+    after ``max_pages``, once its processes use more than ``max_rss_mb``, or
+    after ``max_consecutive_errors`` timeouts/errors in a row. It also
+    serialises re-authentication per account, so when a session expires the
+    first worker to notice logs in again and the others reuse its saved
+    session instead of starting logins of their own.
+    """
+
+    def __init__(self, max_pages=DEFAULT_MAX_PAGES, max_rss_mb=DEFAULT_MAX_RSS_MB,
+                 rss_check_every=DEFAULT_RSS_CHECK_EVERY, max_consecutive_errors=DEFAULT_MAX_CONSECUTIVE_ERRORS,
+                 reauthenticate=True, reauth_cooldown=DEFAULT_REAUTH_COOLDOWN):
+        self.max_pages = max_pages
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.rss_check_every = max(1, int(rss_check_every))
+        self.max_consecutive_errors = max_consecutive_errors
+        self.reauthenticate_enabled = reauthenticate
+        self.reauth_cooldown = reauth_cooldown
+        self.recycled = 0
+        self.reauthenticated = 0
+        self._pages = {}
+        self._errors = {}
+        self._login_locks = {}
+        self._login_failed_at = {}
+        self._lock = threading.Lock()
+        if self.max_rss and psutil is None:
+            logger.info("psutil is not installed, browsers will not be recycled by memory use")
+
+    def check(self, driver, failed=False):
+        """Count one page for ``driver``; returns the reason it should be recycled, or None"""
+        key = id(driver)
+        with self._lock:
+            pages = self._pages[key] = self._pages.get(key, 0) + 1
+            errors = self._errors[key] = self._errors.get(key, 0) + 1 if failed else 0
+        if self.max_consecutive_errors and errors >= self.max_consecutive_errors:
+            return WEDGED
+        if self.max_pages and pages >= self.max_pages:
+            return PAGE_LIMIT
+        if self.max_rss and pages % self.rss_check_every == 0:
+            rss = browser_rss(driver)
+            if rss is not None and rss > self.max_rss:
+                logger.info(f"Browser uses {rss / 1048576:.0f} MB, above the {self.max_rss / 1048576:.0f} MB limit")
+                return MEMORY
+        return None
+
+    def forget(self, driver):
+        """Drop the counters of a driver that was replaced"""
+        with self._lock:
+            self._pages.pop(id(driver), None)
+            self._errors.pop(id(driver), None)
+            self.recycled += 1
+
+    def reauthenticate(self, driver, account, login):
+        """Log ``account`` in again on ``driver`` with ``login(driver)``; returns True on success
+
+        Only one worker per account logs in at a time; the ones waiting behind
+        it get the session it saved through the same ``login`` call. After a
+        failed login, further attempts for the account are refused for
+        ``reauth_cooldown`` seconds.
+        """
+        if not self.reauthenticate_enabled:
+            return False
+        name = getattr(account, 'name', None)
+        with self._lock:
+            lock = self._login_locks.setdefault(name, threading.Lock())
+        with lock:
+            if time.monotonic() - self._login_failed_at.get(name, float('-inf')) < self.reauth_cooldown:
+                return False
+            logger.warning(f"Session of @{name} is logged out, logging in again")
+            try:
+                ok = login(driver)
+            except Exception as e:
+                logger.error(f"Re-authentication of @{name} failed: {e}")
+                ok = False
+            if not ok:
+                self._login_failed_at[name] = time.monotonic()
+                return False
+            with self._lock:
+                self.reauthenticated += 1
+            return True
+
+    def report(self):
+        if self.recycled or self.reauthenticated:
+            logger.info(f"Watchdog recycled {self.recycled} browser(s) and re-authenticated {self.reauthenticated} time(s)")
+
+
+def load_watchdog(config):
+    """Create the driver watchdog from the watchdog section of config.yml"""
+    watchdog_config = config.get('watchdog') or {}
+    return DriverWatchdog(
+        max_pages=watchdog_config.get('max_pages', DEFAULT_MAX_PAGES),
+        max_rss_mb=watchdog_config.get('max_rss_mb', DEFAULT_MAX_RSS_MB),
+        rss_check_every=watchdog_config.get('rss_check_every', DEFAULT_RSS_CHECK_EVERY),
+        max_consecutive_errors=watchdog_config.get('max_consecutive_errors', DEFAULT_MAX_CONSECUTIVE_ERRORS),
+        reauthenticate=watchdog_config.get('reauthenticate', True),
+        reauth_cooldown=watchdog_config.get('reauth_cooldown', DEFAULT_REAUTH_COOLDOWN),
+    )
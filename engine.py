@@ -0,0 +1,1020 @@
+import contextlib
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from id_set import CompactIdSet
+from username_cache import UsernameCache, DEFAULT_CACHE_FILE, DEFAULT_TTL_DAYS
+from checkpoint import Journal, journal_key, OUTCOME_DONE, OUTCOME_FAILED, DEFAULT_JOURNAL_FILE, DEFAULT_SYNC_EVERY, DEFAULT_SYNC_INTERVAL
+from result_writer import ResultWriter, DEFAULT_OUTPUT_FILE, DEFAULT_FLUSH_EVERY, DEFAULT_FLUSH_INTERVAL, FSYNC_ON_FLUSH
+from x_urls import parse_account_id, normalize_user_link, username_from_url, username_from_text, wait_for_redirects, classify_error_page, ERROR_PAGE_SCRIPT, RATE_LIMITED, LOGGED_OUT, CHALLENGE, SUSPENDED, NOT_FOUND
+import http_resolver
+import batch_lookup
+from driver_pool import DriverPool, DEFAULT_BASE_PORT
+from accounts import load_accounts, load_scheduler, QUARANTINED, QUARANTINE_REASONS
+from driver_watchdog import load_watchdog
+from concurrency import load_concurrency
+from metrics import metrics, load_metrics_reporter, OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_SKIPPED
+from dead_letter import load_dead_letter
+from session_store import restore_session, save_session, load_session, DEFAULT_SESSION_FILE
+
+logger = logging.getLogger('follower_extractor')
+
+# Constants
+OUTPUT_FILE = DEFAULT_OUTPUT_FILE
+DEFAULT_QUEUE_POLL = 60  # Seconds between checks while other hosts finish their chunks
+UPDATE_FREQUENCY = DEFAULT_FLUSH_EVERY  # Write to file after every X successful username extractions
+
+# Failure reasons returned by get_username_from_url, next to the error pages classified in x_urls
+TIMEOUT = "timeout"
+UNPARSEABLE = "unparseable"
+ERROR = "error"
+# Transient failures are retried with backoff; permanent ones (dead_letter.PERMANENT_FAILURES) go straight to the dead letter file
+TRANSIENT_FAILURES = {TIMEOUT, RATE_LIMITED, LOGGED_OUT, CHALLENGE, UNPARSEABLE, ERROR}
+# Outcomes that say X is pushing back, so the adaptive concurrency limit is cut
+CONGESTION_SIGNALS = {RATE_LIMITED, TIMEOUT, CHALLENGE}
+# The request itself went through, even though the link did not resolve
+ANSWERED_FAILURES = {SUSPENDED, NOT_FOUND}
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30.0  # Seconds before the first retry, doubled for every further attempt
+DEFAULT_MAX_RETRY_DELAY = 600.0
+
+# Lean browser profile: only the final URL and a few tags are needed, so skip heavy resources
+DEFAULT_PAGE_LOAD_STRATEGY = "eager"
+DEFAULT_PAGE_LOAD_TIMEOUT = 30  # Without a limit a hung driver.get stalls its worker for good
+DEFAULT_SCRIPT_TIMEOUT = 30
+LEAN_BLOCKED_URLS = (
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.mp4", "*.m3u8", "*.m4s", "*.webm", "*.mp3",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*://pbs.twimg.com/*", "*://video.twimg.com/*",
+)
+LEAN_CHROME_ARGUMENTS = (
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--mute-audio",
+    "--autoplay-policy=user-gesture-required",
+)
+
+# Page-content sources in default priority order, all read by one script call:
+# <title>, profile meta tags, canonical link and the profile header's UserName block
+PAGE_SOURCES = ("title", "meta", "canonical", "user_name")
+PAGE_CONTENT_TIMEOUT = 5
+PAGE_CANDIDATES_SCRIPT = """
+var order = arguments[0], candidates = [];
+function meta(names) {
+    for (var i = 0; i < names.length; i++) {
+        var el = document.querySelector('meta[property="' + names[i] + '"], meta[name="' + names[i] + '"]');
+        if (el && el.content) { return el.content; }
+    }
+    return null;
+}
+var readers = {
+    title: function () { return document.title || null; },
+    meta: function () { return meta(['twitter:creator', 'og:title', 'og:url']); },
+    canonical: function () { var link = document.querySelector('link[rel="canonical"]'); return link && link.href; },
+    user_name: function () { var el = document.querySelector('[data-testid="UserName"]'); return el && el.innerText; }
+};
+for (var i = 0; i < order.length; i++) {
+    var value = readers[order[i]] && readers[order[i]]();
+    if (value) { candidates.push([order[i], value]); }
+}
+return candidates.length ? candidates : null;
+"""
+
+def add_lean_options(options, page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY):
+    """Configure a light browser profile: no images, eager page loads, fewer background features"""
+    options.page_load_strategy = page_load_strategy
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+    for argument in LEAN_CHROME_ARGUMENTS:
+        options.add_argument(argument)
+
+def block_heavy_requests(driver, patterns=LEAN_BLOCKED_URLS):
+    """Block media, font and image downloads through the DevTools protocol"""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+    except Exception as e:
+        logger.warning(f"Could not block heavy requests: {e}")
+
+def setup_driver(headless=True, debugging_port=DEFAULT_BASE_PORT, profile_dir=None,
+                 lean=False, page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY, page_load_timeout=None,
+                 blocked_urls=LEAN_BLOCKED_URLS, extra_arguments=None, script_timeout=None):
+    """Set up and return a configured webdriver
+
+    With ``lean`` the browser skips images, media and fonts and returns from
+    ``driver.get`` as soon as the DOM is ready (or immediately with "none").
+    ``extra_arguments`` are passed to Chrome as-is, e.g. host resolver rules
+    that point x.com at the benchmark's mock server.
+    """
+    logger.info(f"Setting up Chrome driver (headless={headless}, lean={lean})")
+    options = webdriver.ChromeOptions()
+    
+    # Separate profiles let several drivers run side by side
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    
+    if lean:
+        add_lean_options(options, page_load_strategy)
+    for argument in extra_arguments or ():
+        options.add_argument(argument)
+    
+    if headless:
+        # Fix for "DevToolsActivePort file doesn't exist" error
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--window-size=1280,800" if lean else "--window-size=1920,1080")
+        options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
+        options.add_argument(f"--remote-debugging-port={debugging_port}")
+        options.add_argument("--disable-blink-features=AutomationControlled")
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option("useAutomationExtension", False)
+    
+    # Common options for both headless and non-headless
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-notifications")
+    options.add_argument("--start-maximized")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    
+    try:
+        driver = webdriver.Chrome(options=options)
+        logger.info("Chrome driver initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize Chrome driver: {e}")
+        
+        # Fallback to non-headless if headless fails
+        if headless:
+            logger.info("Trying to initialize Chrome in non-headless mode as fallback")
+            options = webdriver.ChromeOptions()
+            if profile_dir:
+                options.add_argument(f"--user-data-dir={profile_dir}")
+            if lean:
+                add_lean_options(options, page_load_strategy)
+            for argument in extra_arguments or ():
+                options.add_argument(argument)
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-notifications")
+            options.add_argument("--start-maximized")
+            driver = webdriver.Chrome(options=options)
+            logger.info("Chrome driver initialized in non-headless mode")
+        else:
+            raise
+    
+    if lean:
+        block_heavy_requests(driver, blocked_urls)
+    if page_load_timeout:
+        driver.set_page_load_timeout(page_load_timeout)
+    if script_timeout:
+        driver.set_script_timeout(script_timeout)
+    return driver
+
+def browser_factory(config):
+    """Return a driver factory for DriverPool built from the browser section of config.yml"""
+    browser_config = config.get('browser') or {}
+    headless = browser_config.get('headless', True)
+    lean = browser_config.get('lean', False)
+    
+    def factory(port, profile_dir):
+        return setup_driver(
+            headless=headless,
+            debugging_port=port,
+            profile_dir=profile_dir,
+            lean=lean,
+            page_load_strategy=browser_config.get('page_load_strategy', DEFAULT_PAGE_LOAD_STRATEGY),
+            page_load_timeout=browser_config.get('page_load_timeout', DEFAULT_PAGE_LOAD_TIMEOUT),
+            script_timeout=browser_config.get('script_timeout', DEFAULT_SCRIPT_TIMEOUT),
+            blocked_urls=browser_config.get('blocked_urls') or LEAN_BLOCKED_URLS,
+            extra_arguments=browser_config.get('extra_arguments'),
+        )
+    return factory
+
+def login_to_x(driver, username, password):
+    """Login to X account"""
+    logger.info(f"Attempting to login as @{username}")
+    driver.get("https://x.com/login")
+    
+    try:
+        # Wait for login form
+        logger.info("Waiting for login form...")
+        username_input = WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.XPATH, "//input[@autocomplete='username']"))
+        )
+        username_input.send_keys(username)
+        username_input.send_keys(Keys.RETURN)
+        logger.info("Username submitted")
+        
+        # Check if we need to enter display name instead of just username
+        try:
+            logger.info("Checking for additional username verification...")
+            verify_username = WebDriverWait(driver, 5).until(
+                EC.presence_of_element_located((By.XPATH, "//input[@data-testid='ocfEnterTextTextInput']"))
+            )
+            verify_username.send_keys(username)
+            verify_username.send_keys(Keys.RETURN)
+            logger.info("Additional username verification completed")
+        except TimeoutException:
+            # No verification needed, continue
+            logger.info("No additional username verification required")
+            pass
+        
+        # Enter password
+        logger.info("Entering password...")
+        password_input = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.XPATH, "//input[@autocomplete='current-password']"))
+        )
+        password_input.send_keys(password)
+        password_input.send_keys(Keys.RETURN)
+        
+        # Wait for successful login (home timeline)
+        logger.info("Waiting for home timeline to confirm login...")
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.XPATH, "//div[@data-testid='primaryColumn']"))
+        )
+        logger.info("🔓 LOGIN SUCCESSFUL: Successfully logged in to X")
+        return True
+        
+    except Exception as e:
+        logger.error(f"⚠️ LOGIN FAILED: {e}")
+        try:
+            screenshot_file = f"login_error_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
+            driver.save_screenshot(screenshot_file)
+            logger.info(f"Screenshot saved as {screenshot_file}")
+        except:
+            logger.error("Failed to save screenshot")
+        return False
+
+def ensure_login(driver, config, account=None):
+    """Reuse the saved session if it is still valid, otherwise log in and save a new one
+
+    ``account`` (from load_accounts) selects one of several credential sets and
+    its own session file; without it the single x_credentials block is used.
+    """
+    if account is not None:
+        session_file, credentials = account.session_path, account.credentials
+    else:
+        session_file = (config.get('session') or {}).get('path', DEFAULT_SESSION_FILE)
+        credentials = config['x_credentials']
+    if restore_session(driver, session_file):
+        return True
+    
+    if not login_to_x(driver, credentials['username'], credentials['password']):
+        return False
+    save_session(driver, session_file)
+    return True
+
+class MethodStats:
+    """Thread-safe hit counters per extraction method
+
+    Page-content sources are tried in order of their hit rate so far, which
+    keeps the cheapest successful source first for the rest of the run.
+    """
+    
+    def __init__(self, default_order=PAGE_SOURCES):
+        self.default_order = tuple(default_order)
+        self.attempts = 0
+        self.hits = {}
+        self._lock = threading.Lock()
+    
+    def record(self, method):
+        """Count one resolution attempt and the method that succeeded, if any"""
+        with self._lock:
+            self.attempts += 1
+            if method:
+                self.hits[method] = self.hits.get(method, 0) + 1
+    
+    def ordered_sources(self):
+        with self._lock:
+            # sorted() is stable, so ties keep the default priority order
+            return sorted(self.default_order, key=lambda source: -self.hits.get(source, 0))
+    
+    def report(self):
+        with self._lock:
+            for method, hits in sorted(self.hits.items(), key=lambda item: -item[1]):
+                logger.info(f"Method {method}: {hits} hits ({hits * 100 / max(1, self.attempts):.1f}% of attempts)")
+
+method_stats = MethodStats()
+
+def username_from_candidates(candidates):
+    """Return (username, source) for the first page candidate that names an account, or None"""
+    for source, value in candidates or ():
+        username = username_from_text(value)
+        if username:
+            return username, source
+    return None
+
+def read_page(error_text, candidates):
+    """Classify one look at a page from ERROR_PAGE_SCRIPT and PAGE_CANDIDATES_SCRIPT
+
+    Returns (None, reason) for one of X's error pages, (username, source) for
+    the first candidate that names an account, or None when the page shows
+    neither yet.
+    """
+    error_page = classify_error_page(error_text)
+    if error_page:
+        return None, error_page
+    return username_from_candidates(candidates)
+
+def extract_username_from_page(driver, timeout=PAGE_CONTENT_TIMEOUT):
+    """Read every page-content candidate in one script call and pick the first usable one
+
+    Returns (username, source), (None, reason) when X serves an error page, or
+    (None, None) when nothing names an account. Polls until either shows up or
+    ``timeout`` passes: X's app sets a bare "X" title long before the profile
+    or its error page has rendered.
+    """
+    sources = method_stats.ordered_sources()
+    candidates = []
+    
+    def found(d):
+        error_text = d.execute_script(f"return {ERROR_PAGE_SCRIPT};")
+        candidates[:] = d.execute_script(PAGE_CANDIDATES_SCRIPT, sources) or []
+        return read_page(error_text, candidates)
+    
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.25).until(found)
+    except TimeoutException:
+        logger.info(f"Page candidates did not contain a username: {candidates}")
+        return None, None
+
+def get_username_from_url(driver, url):
+    """Visit URL and extract username from final destination
+
+    Returns a (username, method) tuple. On failure the username is None and
+    the method is the failure reason: timeout, rate_limited, challenge,
+    suspended, not_found, unparseable or error.
+    """
+    logger.debug(f"Processing URL: {url}")
+    try:
+        # With page_load_strategy "none" driver.get returns before the new page
+        # commits, so the browser may still show the previous profile
+        previous_url = None
+        if driver.capabilities.get("pageLoadStrategy") == "none":
+            previous_url = driver.current_url
+        
+        # Navigate to the URL. A load that hits page_load_timeout has usually
+        # redirected long before its last subresource, so stop it and read on
+        navigation_timed_out = False
+        with metrics.span("navigate"):
+            try:
+                driver.get(url)
+            except TimeoutException:
+                logger.info(f"Page load timed out for URL {url}, reading the page it reached")
+                navigation_timed_out = True
+                driver.execute_script("window.stop();")
+        
+        # Wait for redirects to complete; returns as soon as the URL names an account
+        with metrics.span("settle"):
+            final_url = wait_for_redirects(driver, previous_url=previous_url)
+        if final_url is None:
+            logger.error(f"Timed out waiting for the browser to leave {previous_url} for URL {url}")
+            return None, TIMEOUT
+        logger.debug(f"Final URL: {final_url}")
+        
+        with metrics.span("extract"):
+            # Pattern 1 (?screen_name=USERNAME) and Pattern 2 (x.com/USERNAME)
+            username, method = username_from_url(final_url)
+            if username:
+                logger.debug(f"Found username from {method}: {username}")
+                return username, method
+            
+            # Pattern 3: Try to extract from page content with a single targeted script,
+            # watching for X's error pages while the profile renders
+            try:
+                username, source = extract_username_from_page(driver)
+                if username:
+                    logger.debug(f"Found username in page {source}: {username}")
+                    return username, source
+                if source:
+                    logger.warning(f"X served a {source} page for URL: {url}")
+                    return None, source
+            except TimeoutException:
+                pass
+            except Exception as e:
+                logger.warning(f"Error extracting username from page content: {e}")
+        
+        if navigation_timed_out:
+            logger.error(f"Timed out processing URL {url}")
+            return None, TIMEOUT
+        
+        # If still no username found, save the URL for manual inspection
+        logger.warning(f"Could not extract username from URL: {final_url}")
+        return None, UNPARSEABLE
+    
+    except TimeoutException as e:
+        logger.error(f"Timed out processing URL {url}: {e}")
+        return None, TIMEOUT
+    except Exception as e:
+        logger.error(f"Error processing URL {url}: {e}")
+        return None, ERROR
+
+
+def load_cache(config):
+    """Open the persistent username cache configured in config.yml"""
+    cache_config = config.get('cache') or {}
+    return UsernameCache(
+        cache_config.get('path', DEFAULT_CACHE_FILE),
+        cache_config.get('ttl_days', DEFAULT_TTL_DAYS),
+    )
+
+def load_journal(config, resume, writer):
+    """Open the progress journal configured in config.yml"""
+    checkpoint_config = config.get('checkpoint') or {}
+    return Journal(
+        checkpoint_config.get('path', DEFAULT_JOURNAL_FILE),
+        resume=resume,
+        sync_every=checkpoint_config.get('sync_every', DEFAULT_SYNC_EVERY),
+        sync_interval=checkpoint_config.get('sync_interval', DEFAULT_SYNC_INTERVAL),
+        before_sync=writer.flush,
+    )
+
+def load_writer(config, append):
+    """Open the structured result writer configured in config.yml"""
+    output_config = config.get('output') or {}
+    return ResultWriter(
+        output_config.get('path', OUTPUT_FILE),
+        fmt=output_config.get('format'),
+        append=append,
+        flush_every=output_config.get('flush_every', UPDATE_FREQUENCY),
+        flush_interval=output_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL),
+        fsync=output_config.get('fsync', FSYNC_ON_FLUSH),
+    )
+
+class RetryQueue:
+    """Feeds links to the browser pool and re-queues transient failures in the same run
+
+    Failed links come back after an exponentially growing delay until they
+    succeed or reach ``max_attempts``. The feed only ends once every link has
+    either succeeded or been given up on.
+    """
+    
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_RETRY_DELAY, max_delay=DEFAULT_MAX_RETRY_DELAY):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retried = 0
+        self._heap = []
+        self._attempts = {}
+        self._in_flight = 0
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+    
+    def _take_due(self):
+        with self._condition:
+            now = time.monotonic()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            self._in_flight += len(due)
+            return due
+    
+    def feed(self, links):
+        """Yield fresh links interleaved with retries that have come due"""
+        for url in links:
+            yield from self._take_due()
+            with self._condition:
+                self._in_flight += 1
+            yield url
+        
+        # Fresh links are exhausted; keep going until nothing is in flight or waiting
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap and not self._in_flight:
+                        return
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._condition.wait(self._heap[0][0] - now if self._heap else None)
+            yield from self._take_due()
+    
+    def succeeded(self, url):
+        with self._condition:
+            self._in_flight -= 1
+            self._attempts.pop(url, None)
+            self._condition.notify_all()
+    
+    def failed(self, url, reason):
+        """Record a failure; return (requeued, attempts so far)"""
+        with self._condition:
+            self._in_flight -= 1
+            attempts = self._attempts.pop(url, 0) + 1
+            requeued = reason in TRANSIENT_FAILURES and attempts < self.max_attempts
+            if requeued:
+                self._attempts[url] = attempts
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+                heapq.heappush(self._heap, (time.monotonic() + delay, next(self._sequence), url))
+                self.retried += 1
+            self._condition.notify_all()
+            return requeued, attempts
+    
+    def reassign(self, url):
+        """Put a link that was never really tried back in line straight away, without counting an attempt"""
+        with self._condition:
+            self._in_flight -= 1
+            heapq.heappush(self._heap, (time.monotonic(), next(self._sequence), url))
+            self._condition.notify_all()
+
+class ExtractionRun:
+    """Outputs and counters shared by every stage of one extraction run"""
+    
+    def __init__(self, config, append=False, work_queue=None):
+        self.config = config
+        # Shared queue the outcomes are also committed to when several hosts split the archive
+        self.work_queue = work_queue
+        self.cache = load_cache(config)
+        self.writer = load_writer(config, append)
+        self.journal = load_journal(config, append, self.writer)
+        self.dead_letter = load_dead_letter(config, append)
+        self._accounts = None
+        self.counts = {
+            'duplicates': 0, 'from_link': 0, 'cached': 0, 'http': 0, 'batch': 0,
+            'processed': 0, 'successful': 0, 'failed': 0, 'skipped': 0,
+        }
+    
+    def accounts(self):
+        """The run's accounts, built on first use so every stage paces its requests through the same token buckets"""
+        if self._accounts is None:
+            self._accounts = load_accounts(self.config)
+        return self._accounts
+    
+    def record_username(self, url, username, method, elapsed, account_id=None):
+        """Write a resolved username, cache it and journal the account as done"""
+        if account_id is None:
+            account_id = parse_account_id(url)
+        with metrics.span("write"):
+            self.writer.write(account_id, username, method, elapsed * 1000)
+            self.cache.put(account_id, username, method)
+            self.journal.record(journal_key(account_id, url), OUTCOME_DONE, username)
+            if self.work_queue is not None:
+                self.work_queue.record_done(account_id, url, username, method)
+        self.counts['successful'] += 1
+        metrics.inc("results_total", outcome=OUTCOME_SUCCESS)
+        metrics.inc("methods_total", method=method)
+    
+    def record_failure(self, url, reason, attempts):
+        """Dead-letter a link that will not be retried again"""
+        account_id = parse_account_id(url)
+        self.dead_letter.write(url, reason, attempts)
+        self.journal.record(journal_key(account_id, url), OUTCOME_FAILED, reason)
+        if self.work_queue is not None:
+            self.work_queue.record_failed(account_id, url, reason)
+        self.counts['failed'] += 1
+        metrics.inc("results_total", outcome=OUTCOME_FAILURE)
+        metrics.inc("failures_total", reason=reason)
+    
+    def close(self):
+        # Close the writer first so the journal never records rows that are not on disk
+        self.writer.close()
+        self.journal.close()
+        self.dead_letter.close()
+        self.cache.close()
+
+def normalize_entries(entries, run):
+    """Normalize links and drop accounts already seen in any input
+
+    Followers, following and every archive part are deduplicated by account ID
+    in a compact integer set; links without an ID fall back to the link text.
+    """
+    seen_ids = CompactIdSet()
+    seen_links = set()
+    for account_id, url in entries:
+        if account_id is None:
+            account_id = parse_account_id(url)
+        url = normalize_user_link(account_id, url)
+        if account_id is not None:
+            is_new = seen_ids.add(account_id)
+        else:
+            is_new = url not in seen_links
+            seen_links.add(url)
+        if is_new:
+            yield account_id, url
+        else:
+            run.counts['duplicates'] += 1
+            metrics.inc("results_total", outcome=OUTCOME_SKIPPED)
+
+def resolve_named_links(entries, run):
+    """Write links that already carry a screen name straight away, without a visit"""
+    for account_id, url in entries:
+        username, method = username_from_url(url)
+        if username:
+            run.record_username(url, username, f"link_{method}", 0, account_id=account_id)
+            run.counts['from_link'] += 1
+        else:
+            yield account_id, url
+
+def skip_completed_entries(entries, run):
+    """Drop entries whose outcome is already in the journal"""
+    for account_id, url in entries:
+        if run.journal.is_completed(journal_key(account_id, url)):
+            run.counts['skipped'] += 1
+            metrics.inc("results_total", outcome=OUTCOME_SKIPPED)
+        else:
+            yield account_id, url
+
+def skip_cached_links(entries, run):
+    """Write cached usernames straight away and yield the links that still need resolving"""
+    for account_id, url in entries:
+        cached = run.cache.get(account_id)
+        if cached:
+            run.writer.write(account_id, cached[0], cached[1], 0)
+            run.journal.record(journal_key(account_id, url), OUTCOME_DONE, cached[0])
+            if run.work_queue is not None:
+                run.work_queue.record_done(account_id, url, cached[0], cached[1])
+            run.counts['cached'] += 1
+            run.counts['successful'] += 1
+            metrics.inc("results_total", outcome=OUTCOME_SUCCESS)
+            metrics.inc("methods_total", method="cache")
+        else:
+            yield url
+
+def resolve_links_over_http(user_links, run):
+    """Resolve links in batches through the HTTP fast path and yield the ones left over"""
+    http_config = run.config.get('http_fast_path') or {}
+    if not http_config.get('enabled', True):
+        yield from user_links
+        return
+    if not http_resolver.is_available():
+        logger.info("aiohttp is not installed, skipping the HTTP fast path")
+        yield from user_links
+        return
+    
+    # Requests go out with the first account's cookies, so they also spend its rate budget
+    account = run.accounts()[0]
+    session = load_session(account.session_path) or {}
+    resolver = http_resolver.HttpResolver(
+        cookies=session.get('cookies'),
+        concurrency=http_config.get('concurrency', http_resolver.DEFAULT_CONCURRENCY),
+        timeout=http_config.get('timeout', http_resolver.DEFAULT_TIMEOUT),
+        host_map=http_config.get('host_map'),
+        limiter=account.limiter,
+    )
+    batch_size = http_config.get('batch_size', http_resolver.DEFAULT_BATCH_SIZE)
+    
+    def on_result(url, result, elapsed):
+        found_username, method = result
+        run.record_username(url, found_username, method, elapsed)
+        resolved.add(url)
+        run.counts['http'] += 1
+    
+    while True:
+        batch = list(itertools.islice(user_links, batch_size))
+        if not batch:
+            break
+        if resolver.rate_limited:
+            yield from batch
+            continue
+        resolved = set()
+        try:
+            yield from resolver.resolve(batch, on_result)
+        except Exception as e:
+            logger.warning(f"HTTP fast path failed, falling back to the browser: {e}")
+            yield from (url for url in batch if url not in resolved)
+
+def resolve_links_in_batches(user_links, lookup, get_driver, driver_lock, run, limiter):
+    """Resolve links ~100 IDs per request through the logged-in session and yield the ones left over
+
+    Links without an account ID, IDs the endpoint does not return and whole
+    batches that fail fall through to per-link resolution in the browser pool.
+    ``get_driver()`` returns the browser to run the lookup in, which changes
+    when the watchdog recycles it.
+    """
+    errors = 0
+    while True:
+        batch = list(itertools.islice(user_links, lookup.batch_size))
+        if not batch:
+            break
+        if errors >= batch_lookup.MAX_CONSECUTIVE_ERRORS:
+            yield from batch
+            continue
+        
+        ids = {parse_account_id(url): url for url in batch}
+        ids.pop(None, None)
+        found = {}
+        if ids:
+            limiter.acquire()
+            started = time.time()
+            try:
+                with driver_lock:
+                    found = lookup.lookup(get_driver(), list(ids))
+                errors = 0
+                limiter.on_success()
+            except Exception as e:
+                errors += 1
+                if getattr(e, 'status', None) == 429:
+                    limiter.on_rate_limited()
+                logger.warning(f"Batch lookup of {len(ids)} IDs failed, falling back to the browser: {e}")
+                if errors >= batch_lookup.MAX_CONSECUTIVE_ERRORS:
+                    logger.warning(f"Batch lookup failed {errors} times in a row, disabling it for this run")
+            elapsed = (time.time() - started) / len(ids) if ids else 0
+            for account_id, username in found.items():
+                if account_id in ids:
+                    run.record_username(ids[account_id], username, "batch_lookup", elapsed)
+                    run.counts['batch'] += 1
+            logger.info(f"Batch lookup resolved {len(found)} of {len(ids)} IDs")
+        
+        yield from (url for url in batch if parse_account_id(url) not in found)
+
+def load_retry_queue(config):
+    """Create the in-run retry queue configured in config.yml"""
+    retry_config = config.get('retry') or {}
+    return RetryQueue(
+        max_attempts=retry_config.get('max_attempts', DEFAULT_MAX_ATTEMPTS),
+        base_delay=retry_config.get('base_delay', DEFAULT_RETRY_DELAY),
+        max_delay=retry_config.get('max_delay', DEFAULT_MAX_RETRY_DELAY),
+    )
+
+def load_tabs_per_browser(config):
+    """Number of DevTools tabs to multiplex per browser; 1 means classic one-tab Selenium"""
+    tabs_config = config.get('tabs') or {}
+    if not tabs_config.get('enabled', False):
+        return 1
+    import cdp_tabs
+    if not cdp_tabs.is_available():
+        logger.warning("aiohttp is not installed, tab multiplexing disabled")
+        return 1
+    return max(1, int(tabs_config.get('per_browser', cdp_tabs.DEFAULT_TABS)))
+
+def open_tab_multiplexers(drivers, tabs_per_browser, config):
+    """Open K DevTools tabs in every logged-in browser, keyed by id(driver)"""
+    import cdp_tabs
+    browser_config = config.get('browser') or {}
+    blocked_urls = (browser_config.get('blocked_urls') or LEAN_BLOCKED_URLS) if browser_config.get('lean') else None
+    return {
+        id(driver): cdp_tabs.TabMultiplexer(driver, tabs=tabs_per_browser, blocked_urls=blocked_urls)
+        for driver in drivers
+    }
+
+def resolve_links(user_links, run):
+    """Log in once per account and resolve each link with the browser pool, retrying transient failures"""
+    config = run.config
+    pool_config = config.get('pool') or {}
+    tabs_per_browser = load_tabs_per_browser(config)
+    accounts = run.accounts()
+    
+    # Setup browser - set browser.headless to false in config.yml for debugging
+    pool = DriverPool(
+        browser_factory(config),
+        size=sum(account.workers for account in accounts),
+        base_port=pool_config.get('base_port', DEFAULT_BASE_PORT),
+        profile_root=pool_config.get('profile_dir'),
+        threads_per_driver=tabs_per_browser,
+    )
+    multiplexers = {}
+    retry_queue = load_retry_queue(config)
+    watchdog = load_watchdog(config)
+    
+    try:
+        # Login to X/Twitter once per account (or reuse its saved session); its other workers share the cookies
+        started = pool.start_groups([
+            (account.workers, lambda driver, account=account: ensure_login(driver, config, account))
+            for account in accounts
+        ])
+        for account, ok in zip(accounts, started):
+            if not ok:
+                logger.error(f"Failed to login as @{account.name}, continuing without it")
+        if not any(started):
+            logger.error("Failed to login to X/Twitter. Aborting.")
+            # Not a finished run: the links were never tried, so callers must not treat them as done
+            raise RuntimeError("Failed to login to X/Twitter with any account")
+        
+        # Each account paces its own workers with its own token bucket
+        scheduler = load_scheduler([account for account, ok in zip(accounts, started) if ok], config)
+        for driver, group in zip(pool.drivers, pool.groups):
+            scheduler.assign(driver, accounts[group])
+        
+        if tabs_per_browser > 1:
+            multiplexers = open_tab_multiplexers(pool.drivers, tabs_per_browser, config)
+        
+        # Raises and cuts the number of links in flight across all workers, and each account's request rate, from live results
+        concurrency = load_concurrency(
+            config, len(pool.drivers) * tabs_per_browser, [account.limiter for account in scheduler.accounts],
+        )
+        
+        # Batch lookups run in the first browser's page, so its worker takes turns with them
+        lookup = batch_lookup.load_batch_lookup(config)
+        lookup_lock = threading.Lock()
+        if lookup:
+            lookup_limiter = scheduler.account_for(pool.drivers[0]).limiter
+            user_links = resolve_links_in_batches(
+                user_links, lookup, lambda: pool.drivers[0], lookup_lock, run, lookup_limiter,
+            )
+        
+        def driver_lock(driver):
+            # The lookup driver is only used while holding the lock the batch lookups take
+            return lookup_lock if lookup and driver is pool.drivers[0] else contextlib.nullcontext()
+        
+        def before_take(driver):
+            # Workers only take a link while their account is healthy and within its rate budget
+            with metrics.span("wait"):
+                scheduler.wait_until_ready(driver)
+        
+        def visit(driver, url):
+            if multiplexers:
+                return multiplexers[id(driver)].resolve(url)
+            with driver_lock(driver):
+                return get_username_from_url(driver, url)
+        
+        # Process each URL and extract usernames
+        def resolve(driver, url):
+            account = scheduler.account_for(driver)
+            if account.is_quarantined():
+                # The account was quarantined after this worker took the link; hand it back
+                return None, QUARANTINED
+            if concurrency is not None:
+                with metrics.span("wait"):
+                    started = concurrency.acquire()
+            result = (None, ERROR)
+            try:
+                with metrics.trace(url):
+                    result = visit(driver, url)
+                    if result[1] == LOGGED_OUT:
+                        with driver_lock(driver):
+                            relogged = watchdog.reauthenticate(
+                                driver, account, lambda target: ensure_login(target, config, account),
+                            )
+                        if relogged:
+                            # The link was not at fault: visit it again on the fresh session instead of failing it
+                            metrics.inc("reauthenticated_total")
+                            result = visit(driver, url)
+            finally:
+                if concurrency is not None:
+                    congested = result[1] if not result[0] and result[1] in CONGESTION_SIGNALS else None
+                    concurrency.release(
+                        started,
+                        healthy=bool(result[0]) or result[1] in ANSWERED_FAILURES,
+                        congested=congested,
+                        latency=time.monotonic() - started,
+                        limiter=account.limiter,
+                    )
+                    if congested:
+                        metrics.inc("congestion_signals_total", reason=congested)
+            method_stats.record(result[1] if result[0] else None)
+            if result[1] == RATE_LIMITED:
+                metrics.inc("rate_limited_total")
+            scheduler.record(account, result)
+            return result
+        
+        def after_resolve(worker_id, driver, result):
+            # Replace browsers that have loaded too many pages, grown too large or stopped responding
+            reason = watchdog.check(driver, failed=not result[0] and result[1] in (TIMEOUT, ERROR, None))
+            if reason is None:
+                return
+            account = scheduler.account_for(driver)
+            
+            def prepare(new_driver):
+                scheduler.assign(new_driver, account)
+                if not ensure_login(new_driver, config, account):
+                    logger.warning(f"Recycled browser of worker {worker_id} is not logged in as @{account.name}")
+            
+            logger.info(f"Recycling the browser of worker {worker_id} ({reason})")
+            with driver_lock(driver):
+                pool.recycle(worker_id, prepare)
+            watchdog.forget(driver)
+            metrics.inc("recycled_total", reason=reason)
+        
+        def on_result(worker_id, url, result, elapsed):
+            found_username, method = result
+            run.counts['processed'] += 1
+            logger.debug(f"Processed URL {run.counts['processed']} in the browser (worker {worker_id})")
+            
+            if found_username:
+                # Write username to file immediately
+                run.record_username(url, found_username, method, elapsed)
+                retry_queue.succeeded(url)
+                logger.debug(f"Found and saved username: {found_username} ({run.counts['successful']} total)")
+                return
+            
+            account = scheduler.account_for(pool.drivers[worker_id])
+            if method == QUARANTINED or (method in QUARANTINE_REASONS and scheduler.can_reassign(account)):
+                # Account trouble, not a problem with the link: let another account take it
+                retry_queue.reassign(url)
+                metrics.inc("reassigned_total")
+                logger.info(f"Handing {url} from @{account.name} to the other accounts")
+                return
+            
+            reason = method or ERROR
+            requeued, attempts = retry_queue.failed(url, reason)
+            if requeued:
+                metrics.inc("retries_total", reason=reason)
+                logger.info(f"Will retry {url} after {reason} (attempt {attempts} of {retry_queue.max_attempts})")
+            else:
+                run.record_failure(url, reason, attempts)
+                logger.warning(f"Giving up on URL: {url} ({reason}, {run.counts['failed']} total)")
+        
+        # Tabs share their browser between threads, so it cannot be swapped out under them
+        pool.run(retry_queue.feed(user_links), resolve, on_result, before_take, None if multiplexers else after_resolve)
+        pool.report()
+        scheduler.report()
+        watchdog.report()
+        if concurrency is not None:
+            concurrency.report()
+        method_stats.report()
+        if retry_queue.retried:
+            logger.info(f"Retried {retry_queue.retried} transient failures in-process")
+    
+    finally:
+        # Always close the browsers
+        logger.info("Closing browser...")
+        for multiplexer in multiplexers.values():
+            multiplexer.close()
+        pool.close()
+
+def count_total_in_background(count):
+    """Run ``count()`` on a daemon thread and hand its result to the progress ETA when it is done"""
+    def run():
+        try:
+            total = count()
+        except Exception as e:
+            logger.warning(f"Could not count the archive for the progress ETA: {e}")
+            return
+        metrics.set_total(total)
+        logger.info(f"Archive holds {total} accounts")
+    threading.Thread(target=run, name="count-total", daemon=True).start()
+
+def run_extraction(config, entries, append=False, skip_completed=False, total=None, work_queue=None, count_total=None):
+    """Resolve (account_id, userLink) entries and return the run's counters
+
+    Entries flow through the journal (when ``skip_completed``), the cache and
+    the HTTP fast path; only what is left starts the browser pool. With
+    ``append`` the existing outputs are extended instead of replaced.
+    ``total`` is the number of entries, if known, for the progress ETA;
+    otherwise ``count_total()``, if given, counts them while the run goes on.
+    Outcomes are also committed to ``work_queue`` when one is given.
+    """
+    metrics.reset(total)
+    if total is None and count_total is not None:
+        count_total_in_background(count_total)
+    reporter = load_metrics_reporter(metrics, config).start()
+    run = ExtractionRun(config, append=append, work_queue=work_queue)
+    try:
+        # Drop duplicates, skip accounts finished by an earlier run, resolve links that name the
+        # account, answer already-resolved ones from the cache, then try plain HTTP redirects;
+        # only links that stay unresolved need the browser
+        pending_entries = normalize_entries(entries, run)
+        if skip_completed:
+            pending_entries = skip_completed_entries(pending_entries, run)
+        pending_entries = resolve_named_links(pending_entries, run)
+        pending_links = skip_cached_links(pending_entries, run)
+        pending_links = resolve_links_over_http(pending_links, run)
+        
+        first_link = next(pending_links, None)
+        if first_link is not None:
+            resolve_links(itertools.chain([first_link], pending_links), run)
+        
+        counts = run.counts
+        if counts['skipped']:
+            logger.info(f"Skipped {counts['skipped']} accounts completed by a previous run")
+        saved = counts['duplicates'] + counts['from_link']
+        if saved:
+            logger.info(
+                f"Pre-pass saved {saved} browser visits ({counts['duplicates']} duplicate accounts, "
+                f"{counts['from_link']} links that already named the account)"
+            )
+        logger.info(
+            f"✅ EXTRACTION COMPLETE: Found {counts['successful']} usernames "
+            f"({counts['cached']} cached, {counts['http']} via HTTP, {counts['batch']} via batch lookup), "
+            f"{counts['failed']} links failed"
+        )
+        logger.info(f"Results saved to {run.writer.path}")
+        if counts['failed'] > 0:
+            logger.info(f"Failed URLs and their reasons saved to {run.dead_letter.path}")
+        return counts
+    finally:
+        run.close()
+        reporter.stop()
+
+def run_from_queue(config, work_queue, poll=DEFAULT_QUEUE_POLL):
+    """Process leased chunks of the shared work queue until every account in it is finished
+
+    When the only unfinished chunks are leased by other hosts, wait for them to
+    finish or for their leases to expire and be reclaimed.
+    """
+    while True:
+        run_extraction(config, work_queue.iter_entries(), append=True, work_queue=work_queue)
+        # Links still waiting for a retry when the run ended go back to the pool
+        work_queue.release()
+        status = work_queue.status()
+        leased = status['chunks'].get('leased', 0)
+        if not leased and not status['chunks'].get('pending', 0):
+            logger.info(f"Work queue finished: {status['items']}")
+            return status
+        wait = poll
+        if status['next_expiry']:
+            wait = min(poll, max(1.0, status['next_expiry'] - time.time()))
+        logger.info(f"{leased} chunk(s) still leased by other workers, checking again in {wait:.0f}s")
+        time.sleep(wait)
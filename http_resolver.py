@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from urllib.parse import urljoin, urlsplit
+from x_urls import username_from_url
+
+# aiohttp is optional: without it the HTTP fast path is skipped and every link goes to Selenium
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_BATCH_SIZE = 500  # Links handed to the resolver at a time when streaming
+DEFAULT_TIMEOUT = 15  # Seconds per request
+MAX_REDIRECTS = 10
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# The session cookies are only sent to, and redirects only followed within, X's own hosts
+X_HOSTS = ("x.com", "twitter.com")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+def is_available():
+    return aiohttp is not None
+
+
+def is_x_url(url):
+    """True for http(s) URLs on x.com, twitter.com or one of their subdomains"""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return parts.scheme in ("http", "https") and any(host == name or host.endswith("." + name) for name in X_HOSTS)
+
+
+def rewrite_origin(url, host_map):
+    """Send requests for a canonical origin somewhere else, e.g. a local stub server
+
+    ``host_map`` maps origins such as "https://twitter.com" to replacements
+    such as "http://127.0.0.1:8080". Extraction always sees the canonical URL.
+    """
+    for origin, replacement in (host_map or {}).items():
+        if url.startswith(origin):
+            return replacement + url[len(origin):]
+    return url
+
+
+class HttpResolver:
+    """Resolve userLinks by following their HTTP redirect chain, without a browser
+
+    Uses one pooled keep-alive session with at most ``concurrency`` requests in
+    flight. The same screen_name= / x.com/<path> rules as the Selenium path are
+    applied to every hop. The logged-in cookies are only sent to X's hosts, and
+    a redirect anywhere else ends the chain so the browser takes the link.
+    ``limiter`` (a rate_limiter.TokenBucket) paces every request and is told
+    about 429s, so the fast path shares the account's rate budget.
+    """
+
+    def __init__(self, cookies=None, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, host_map=None,
+                 limiter=None):
+        self.cookie_header = "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in (cookies or []))
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.host_map = host_map or {}
+        self.limiter = limiter
+        self.rate_limited = False
+
+    async def _resolve_one(self, session, url):
+        current_url = url
+        for _ in range(MAX_REDIRECTS + 1):
+            username, method = username_from_url(current_url)
+            if username:
+                return username, f"http_{method}"
+            if not is_x_url(current_url):
+                return None, None
+
+            if self.limiter is not None:
+                # TokenBucket.acquire sleeps, so wait for it off the event loop
+                await asyncio.get_running_loop().run_in_executor(None, self.limiter.acquire)
+            headers = {"Cookie": self.cookie_header} if self.cookie_header else None
+            async with session.get(
+                rewrite_origin(current_url, self.host_map), allow_redirects=False, headers=headers,
+            ) as response:
+                if response.status == 429:
+                    if self.limiter is not None:
+                        self.limiter.on_rate_limited()
+                    return None, "rate_limited"
+                if self.limiter is not None:
+                    self.limiter.on_success()
+                location = response.headers.get("Location")
+                if response.status not in REDIRECT_STATUSES or not location:
+                    return None, None
+            # Relative redirects resolve against the canonical URL, not the rewritten one
+            current_url = urljoin(current_url, location)
+        return None, None
+
+    async def _worker(self, session, pending, on_result, unresolved):
+        while pending:
+            url = pending.pop()
+            if self.rate_limited:
+                unresolved.append(url)
+                continue
+            started = time.monotonic()
+            try:
+                username, method = await self._resolve_one(session, url)
+            except Exception as e:
+                logger.debug(f"HTTP fast path failed for {url}: {e}")
+                username, method = None, None
+
+            if username:
+                on_result(url, (username, method), time.monotonic() - started)
+                continue
+            if method == "rate_limited" and not self.rate_limited:
+                # Leave the rest to the rate-limited browser path instead of hammering X
+                logger.warning("HTTP fast path got 429, handing remaining links to the browser")
+                self.rate_limited = True
+            unresolved.append(url)
+
+    async def resolve_async(self, urls, on_result):
+        pending = list(reversed(list(urls)))
+        unresolved = []
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            # Cookies are added per request for X's hosts only; nothing a response sets is replayed
+            cookie_jar=aiohttp.DummyCookieJar(),
+            headers={"User-Agent": USER_AGENT},
+        ) as session:
+            await asyncio.gather(*(
+                self._worker(session, pending, on_result, unresolved) for _ in range(self.concurrency)
+            ))
+        return unresolved
+
+    def resolve(self, urls, on_result):
+        """Resolve ``urls``, calling ``on_result(url, (username, method), elapsed)`` for each hit
+
+        Returns the list of URLs that still need the browser.
+        """
+        urls = list(urls)
+        unresolved = asyncio.run(self.resolve_async(urls, on_result))
+        logger.info(f"HTTP fast path resolved {len(urls) - len(unresolved)} of {len(urls)} links")
+        # Keep the original order for the browser pass
+        unresolved_set = set(unresolved)
+        return [url for url in urls if url in unresolved_set]
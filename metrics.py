@@ -0,0 +1,307 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_SUMMARY_FILE = "metrics.json"
+DEFAULT_PROMETHEUS_FILE = "metrics.prom"
+DEFAULT_REPORT_INTERVAL = 30.0  # Seconds between progress lines and metric file updates
+METRIC_PREFIX = "xid2username_"
+# Upper bounds in seconds; the last bucket (+Inf) catches everything slower
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Result outcomes counted in results_total
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+OUTCOME_SKIPPED = "skipped"
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the largest bound for +Inf)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """Thread-safe counters, latency histograms and per-URL timing spans for one run
+
+    Spans (``wait``, ``navigate``, ``settle``, ``extract``, ``write``) feed the
+    ``phase_seconds`` histogram; inside a ``trace`` they are also collected per
+    URL and logged as one JSON line at DEBUG.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self, total=None):
+        """Start counting a new run of ``total`` entries (None when unknown)"""
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+            self.total = total
+            self.started = time.time()
+
+    def set_total(self, total):
+        """Fill in the number of entries once it is known, e.g. from a count running alongside the run"""
+        with self._lock:
+            self.total = total
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self.counters.get((name, _label_key(labels)), 0)
+
+    @contextmanager
+    def span(self, phase):
+        """Time one phase of the current URL"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe("phase_seconds", elapsed, phase=phase)
+            spans = getattr(self._local, "spans", None)
+            if spans is not None:
+                spans[phase] = spans.get(phase, 0.0) + elapsed
+
+    @contextmanager
+    def trace(self, url):
+        """Collect the spans of one URL on this thread and log them when it is done"""
+        self._local.spans = spans = {}
+        started = time.perf_counter()
+        try:
+            yield spans
+        finally:
+            self._local.spans = None
+            elapsed = time.perf_counter() - started
+            self.observe("url_seconds", elapsed)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(json.dumps({
+                    "url": url,
+                    "total_ms": round(elapsed * 1000, 1),
+                    "spans_ms": {phase: round(seconds * 1000, 1) for phase, seconds in spans.items()},
+                }))
+
+    def progress(self):
+        """Return (done, resolved_per_minute, eta_seconds); eta is None when the total is unknown"""
+        with self._lock:
+            done = {outcome: 0 for outcome in (OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_SKIPPED)}
+            for (name, key), value in self.counters.items():
+                if name == "results_total":
+                    done[dict(key).get("outcome")] = done.get(dict(key).get("outcome"), 0) + value
+            elapsed = max(time.time() - self.started, 1e-6)
+            total = self.total
+        finished = sum(done.values())
+        # Skipped entries cost nothing, so they do not count towards throughput
+        worked = done[OUTCOME_SUCCESS] + done[OUTCOME_FAILURE]
+        per_minute = worked * 60 / elapsed
+        eta = None
+        if total is not None and per_minute > 0:
+            eta = max(0, total - finished) * 60 / per_minute
+        return finished, per_minute, eta
+
+    def snapshot(self):
+        """JSON-serialisable summary of every counter and histogram"""
+        finished, per_minute, eta = self.progress()
+        with self._lock:
+            counters = {}
+            for (name, key), value in sorted(self.counters.items()):
+                counters[name + _format_labels(key)] = value
+            histograms = {}
+            for (name, key), histogram in sorted(self.histograms.items()):
+                histograms[name + _format_labels(key)] = histogram.summary()
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "elapsed_seconds": round(time.time() - self.started, 1),
+            "total": self.total,
+            "done": finished,
+            "ids_per_minute": round(per_minute, 2),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "counters": counters,
+            "histograms": histograms,
+        }
+
+    def prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                for (metric, key), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{METRIC_PREFIX}{name}{_format_labels(key)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for (metric, key), histogram in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class MetricsReporter:
+    """Log live throughput and ETA, and export metrics, every ``interval`` seconds
+
+    Writes a JSON summary and a Prometheus text file (for node_exporter's
+    textfile collector), and optionally serves the same text on ``port``.
+    """
+
+    def __init__(self, metrics, interval=DEFAULT_REPORT_INTERVAL, summary_path=DEFAULT_SUMMARY_FILE,
+                 prometheus_path=DEFAULT_PROMETHEUS_FILE, port=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.summary_path = summary_path
+        self.prometheus_path = prometheus_path
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="metrics-reporter", daemon=True)
+        self._server = None
+        if port:
+            self._server = ThreadingHTTPServer(("127.0.0.1", int(port)), self._handler())
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving Prometheus metrics on http://127.0.0.1:{self._server.server_address[1]}/metrics")
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def report(self):
+        finished, per_minute, eta = self.metrics.progress()
+        total = f"/{self.metrics.total}" if self.metrics.total is not None else ""
+        eta_text = f", ETA {format_duration(eta)}" if eta is not None else ""
+        logger.info(f"Progress: {finished}{total} done, {per_minute:.1f} IDs/min{eta_text}")
+        try:
+            if self.summary_path:
+                _write_atomic(self.summary_path, json.dumps(self.metrics.snapshot(), indent=2))
+            if self.prometheus_path:
+                _write_atomic(self.prometheus_path, self.metrics.prometheus())
+        except OSError as e:
+            logger.warning(f"Could not write metrics: {e}")
+
+    def stop(self):
+        """Stop reporting and write the final summary"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.report()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def load_metrics_reporter(metrics, config):
+    """Build the reporter configured in the metrics section of config.yml"""
+    metrics_config = config.get('metrics') or {}
+    return MetricsReporter(
+        metrics,
+        interval=metrics_config.get('interval', DEFAULT_REPORT_INTERVAL),
+        summary_path=metrics_config.get('summary_path', DEFAULT_SUMMARY_FILE),
+        prometheus_path=metrics_config.get('prometheus_path', DEFAULT_PROMETHEUS_FILE),
+        port=metrics_config.get('port'),
+    )
+
+
+# Shared by every stage and worker thread of the current run
+metrics = Metrics()
@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_RATE = 0.5  # Requests per second across all workers
+DEFAULT_BURST = 1
+DEFAULT_BASE_BACKOFF = 15.0
+DEFAULT_MAX_BACKOFF = 300.0
+RECOVERY_SUCCESSES = 10  # Consecutive successes needed to undo one backoff step
+
+
+class TokenBucket:
+    """Thread-safe token bucket with exponential backoff on rate limiting
+
+    Each rate-limit signal pauses all callers for an exponentially growing
+    interval and halves the refill rate. Every RECOVERY_SUCCESSES successes in
+    a row undo one backoff step until the configured rate is reached again.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 base_backoff=DEFAULT_BASE_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.backoff_level = 0
+        self.waits = 0  # Acquires that had to wait for a token, i.e. the bucket was holding workers back
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def current_rate(self):
+        return self.rate / (2 ** self.backoff_level)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.current_rate())
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.current_rate()
+                    if not waited:
+                        waited = True
+                        self.waits += 1
+            time.sleep(wait)
+
+    def set_rate(self, rate):
+        """Change the configured rate, e.g. from the adaptive concurrency controller"""
+        with self._lock:
+            # Tokens earned so far are kept at the old rate
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def on_rate_limited(self):
+        """Back off after a rate-limit page or 429 response"""
+        with self._lock:
+            self.backoff_level += 1
+            self._successes = 0
+            pause = min(self.max_backoff, self.base_backoff * 2 ** (self.backoff_level - 1))
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + pause)
+            self._tokens = 0
+            self._updated = now
+            logger.warning(
+                f"Rate limited: pausing {pause:.0f}s, rate lowered to {self.current_rate():.3f} req/s"
+            )
+
+    def on_success(self):
+        """Record a successful request, gradually restoring the configured rate"""
+        with self._lock:
+            if not self.backoff_level:
+                return
+            self._successes += 1
+            if self._successes >= RECOVERY_SUCCESSES:
+                self._refill(time.monotonic())
+                self.backoff_level -= 1
+                self._successes = 0
+                logger.info(f"Rate limiter recovering: {self.current_rate():.3f} req/s")
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_OUTPUT_FILE = "followers.csv"
+DEFAULT_FLUSH_EVERY = 50  # Rows buffered before a flush
+DEFAULT_FLUSH_INTERVAL = 5.0  # Maximum seconds a row stays buffered
+RESULT_FIELDS = ("account_id", "username", "method", "elapsed_ms", "timestamp")
+
+# fsync policies: "never" leaves durability to the OS, "flush" fsyncs on every flush
+FSYNC_NEVER = "never"
+FSYNC_ON_FLUSH = "flush"
+
+
+def detect_format(path):
+    """Pick jsonl for .jsonl/.ndjson files and csv for everything else"""
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+class ResultWriter:
+    """Buffered writer for account_id,username,method,elapsed_ms,timestamp rows
+
+    Rows are flushed every ``flush_every`` rows or ``flush_interval`` seconds,
+    whichever comes first, and on close. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_OUTPUT_FILE, fmt=None, append=False,
+                 flush_every=DEFAULT_FLUSH_EVERY, flush_interval=DEFAULT_FLUSH_INTERVAL, fsync=FSYNC_ON_FLUSH):
+        self.path = path
+        self.format = fmt or detect_format(path)
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows_written = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+        if self.format == "csv" and self._file.tell() == 0:
+            self._buffer.append(self._format_row(dict(zip(RESULT_FIELDS, RESULT_FIELDS))))
+
+    def _format_row(self, row):
+        if self.format == "jsonl":
+            return json.dumps(row, ensure_ascii=False) + "\n"
+        line = io.StringIO()
+        csv.writer(line, lineterminator="\n").writerow([row.get(field, "") for field in RESULT_FIELDS])
+        return line.getvalue()
+
+    def write(self, account_id, username, method=None, elapsed_ms=None, timestamp=None):
+        """Buffer one result row"""
+        row = {
+            "account_id": account_id,
+            "username": username,
+            "method": method,
+            "elapsed_ms": round(elapsed_ms) if elapsed_ms is not None else None,
+            "timestamp": timestamp or time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if self.format == "csv":
+            row = {key: "" if value is None else value for key, value in row.items()}
+        with self._lock:
+            self._buffer.append(self._format_row(row))
+            self.rows_written += 1
+            if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+            self._file.flush()
+            if self.fsync == FSYNC_ON_FLUSH:
+                os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush()
+            self._file.close()
+        logger.info(f"Wrote {self.rows_written} result rows to {self.path}")
+
+
+def read_results(path, fmt=None):
+    """Yield result rows from a CSV or JSONL results file as dicts"""
+    fmt = fmt or detect_format(path)
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if fmt == "jsonl":
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def read_latest_results(path, fmt=None):
+    """Read a results file into {account_id: (username, method, elapsed_ms, timestamp)}
+
+    Later rows win, so a file that was appended to by retries gives the latest
+    name for every account. Rows without an account ID are left out.
+    """
+    latest = {}
+    for row in read_results(path, fmt):
+        account_id = str(row.get("account_id") or "")
+        if not account_id.isdigit() or not row.get("username"):
+            continue
+        elapsed_ms = row.get("elapsed_ms")
+        latest[int(account_id)] = (
+            row["username"], row.get("method") or None,
+            float(elapsed_ms) if elapsed_ms not in (None, "") else None, row.get("timestamp") or None,
+        )
+    return latest
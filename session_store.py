@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_SESSION_FILE = "x_session.json"
+SESSION_ORIGIN = "https://x.com/"
+SESSION_CHECK_URL = "https://x.com/home"
+LOGIN_URL_MARKERS = ("/login", "/i/flow/", "/logout")
+
+
+def save_session(driver, path=DEFAULT_SESSION_FILE):
+    """Save cookies and local storage of a logged-in driver to an owner-only file"""
+    try:
+        session = {
+            'saved_at': time.time(),
+            'cookies': driver.get_cookies(),
+            'local_storage': driver.execute_script(
+                "var items = {};"
+                "for (var i = 0; i < localStorage.length; i++) {"
+                "  var key = localStorage.key(i); items[key] = localStorage.getItem(key);"
+                "}"
+                "return items;"
+            ) or {},
+        }
+        # Write with 0600 permissions and swap in atomically so credentials never sit world-readable
+        tmp_path = f"{path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(session, file)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+        logger.info(f"Session saved to {path}")
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to save session to {path}: {e}")
+        return False
+
+
+def load_session(path=DEFAULT_SESSION_FILE):
+    """Return the saved session dict, or None if there is no usable file"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable session file {path}: {e}")
+        return None
+
+
+def is_logged_in(driver, timeout=10):
+    """Open the home timeline once and report whether the session is still valid"""
+    driver.get(SESSION_CHECK_URL)
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: any(marker in d.current_url for marker in LOGIN_URL_MARKERS)
+            or d.find_elements(By.XPATH, "//div[@data-testid='primaryColumn']")
+        )
+    except Exception:
+        return False
+    return not any(marker in driver.current_url for marker in LOGIN_URL_MARKERS)
+
+
+def restore_session(driver, path=DEFAULT_SESSION_FILE):
+    """Load a saved session into the driver and check that it is still logged in"""
+    session = load_session(path)
+    if not session:
+        return False
+
+    logger.info(f"Restoring saved session from {path}")
+    # Cookies and local storage can only be set on the matching origin
+    driver.get(SESSION_ORIGIN)
+    now = time.time()
+    for cookie in session.get('cookies', []):
+        if cookie.get('expiry') and cookie['expiry'] < now:
+            continue
+        try:
+            driver.add_cookie(cookie)
+        except Exception as e:
+            logger.warning(f"Could not restore cookie {cookie.get('name')}: {e}")
+    local_storage = session.get('local_storage') or {}
+    if local_storage:
+        driver.execute_script(
+            "var items = arguments[0];"
+            "for (var key in items) { localStorage.setItem(key, items[key]); }",
+            local_storage,
+        )
+
+    if is_logged_in(driver):
+        logger.info("🔓 Saved session is still valid, skipping login")
+        return True
+    logger.info("Saved session has expired")
+    return False
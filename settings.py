@@ -0,0 +1,34 @@
+import logging
+import os
+
+logger = logging.getLogger('follower_extractor')
+
+CONFIG_FILE = "config.yml"
+
+
+def read_config(path=CONFIG_FILE):
+    """Return the parsed config file, or an empty config if there is none
+
+    For commands that only read existing outputs and need no credentials.
+    """
+    if not os.path.exists(path):
+        return {}
+    # PyYAML is only imported by the commands that read a config file
+    import yaml
+    with open(path, 'r') as file:
+        return yaml.safe_load(file) or {}
+
+
+def load_config(path=CONFIG_FILE):
+    """Load configuration from YAML file"""
+    logger.info(f"Loading configuration from {path}")
+    try:
+        import yaml
+        with open(path, 'r') as file:
+            config = yaml.safe_load(file)
+            names = [credentials.get('account_name', 'N/A') for credentials in config.get('x_accounts') or [config['x_credentials']]]
+            logger.info(f"Configuration loaded for account(s): {', '.join('@' + name for name in names)}")
+            return config
+    except Exception as e:
+        logger.error(f"Failed to load configuration: {e}")
+        raise
@@ -0,0 +1,204 @@
+import csv
+import logging
+import os
+import random
+import time
+from id_set import CompactIdSet
+from engine import run_extraction
+from result_writer import ResultWriter, read_results, read_latest_results, detect_format, DEFAULT_OUTPUT_FILE, FSYNC_NEVER
+from x_urls import parse_account_id, normalize_user_link
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_DIFF_OUTPUT_FILE = "diff_resolved.csv"
+DEFAULT_REPORT_DIR = "diff_reports"
+MERGE_FLUSH_EVERY = 10000
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+ADDED_FIELDS = ("account_id", "username")
+REMOVED_FIELDS = ("account_id", "username")
+RENAMED_FIELDS = ("account_id", "old_username", "new_username")
+
+
+def _number(value):
+    return float(value) if value not in (None, "") else None
+
+
+def read_previous_results(path):
+    """Read the previous run's results into {account_id: (username, method, elapsed_ms, timestamp)}"""
+    previous = read_latest_results(path)
+    logger.info(f"Previous snapshot {path} holds {len(previous)} resolved accounts")
+    return previous
+
+
+def _is_stale(timestamp, stale_before):
+    if stale_before is None:
+        return False
+    try:
+        return time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT)) < stale_before
+    except (TypeError, ValueError):
+        # Rows without a readable timestamp are as good as stale
+        return True
+
+
+class SnapshotDiff:
+    """Compare a new archive against the previous run's results by account ID
+
+    Only IDs that are new since the previous run are resolved, plus a random
+    ``recheck_fraction`` of the known ones and every known one resolved more
+    than ``stale_days`` ago, so renames are still picked up over time.
+    """
+
+    def __init__(self, previous, recheck_fraction=0.0, stale_days=None, seed=None):
+        self.previous = previous
+        self.recheck_fraction = recheck_fraction or 0.0
+        self.stale_before = time.time() - stale_days * 86400 if stale_days is not None else None
+        self._random = random.Random(seed)
+        self.current_ids = CompactIdSet()
+        self.added = []
+        self.rechecked = set()
+        self.unchanged = 0
+        self.duplicates = 0
+
+    def plan(self, entries):
+        """Yield the (account_id, userLink) entries that need resolving in this run"""
+        for account_id, url in entries:
+            if account_id is None:
+                account_id = parse_account_id(url)
+            url = normalize_user_link(account_id, url)
+            if account_id is None:
+                # Nothing to compare against, so it is resolved like a new account
+                yield account_id, url
+                continue
+            if not self.current_ids.add(account_id):
+                self.duplicates += 1
+                continue
+            known = self.previous.get(account_id)
+            if known is None:
+                self.added.append(account_id)
+                yield account_id, url
+            elif _is_stale(known[3], self.stale_before) or self._random.random() < self.recheck_fraction:
+                self.rechecked.add(account_id)
+                yield account_id, url
+            else:
+                self.unchanged += 1
+
+    def removed(self):
+        """Yield the previously resolved IDs that are no longer in the archive"""
+        for account_id in self.previous:
+            if account_id not in self.current_ids:
+                yield account_id
+
+    def merge(self, resolved_path, output_path, fmt=None):
+        """Write the complete new snapshot and return {account_id: username} resolved in this run
+
+        Rows resolved in this run (read from ``resolved_path``, None if nothing
+        was resolved) come first, followed by the previous rows of
+        every account still in the archive that was not resolved again. The
+        file is written next to ``output_path`` and moved over it at the end.
+        """
+        resolved = {}
+        temp_path = f"{output_path}.tmp"
+        writer = ResultWriter(
+            temp_path, fmt=fmt or detect_format(output_path), flush_every=MERGE_FLUSH_EVERY, fsync=FSYNC_NEVER,
+        )
+        try:
+            if resolved_path is not None:
+                for row in read_results(resolved_path):
+                    account_id = str(row.get("account_id") or "")
+                    account_id = int(account_id) if account_id.isdigit() else None
+                    if account_id is not None:
+                        resolved[account_id] = row["username"]
+                    writer.write(
+                        account_id, row["username"], row.get("method") or None,
+                        _number(row.get("elapsed_ms")), row.get("timestamp") or None,
+                    )
+            for account_id, (username, method, elapsed_ms, timestamp) in self.previous.items():
+                if account_id in self.current_ids and account_id not in resolved:
+                    writer.write(account_id, username, method, elapsed_ms, timestamp)
+        finally:
+            writer.close()
+        os.replace(temp_path, output_path)
+        return resolved
+
+    def write_reports(self, resolved, report_dir=DEFAULT_REPORT_DIR):
+        """Write added.csv, removed.csv and renamed.csv; returns the number of rows in each"""
+        os.makedirs(report_dir, exist_ok=True)
+        counts = {}
+
+        def write(name, fields, rows):
+            count = 0
+            with open(os.path.join(report_dir, f"{name}.csv"), "w", encoding="utf-8", newline="") as file:
+                report = csv.writer(file, lineterminator="\n")
+                report.writerow(fields)
+                for row in rows:
+                    report.writerow(row)
+                    count += 1
+            counts[name] = count
+
+        # Accounts that failed to resolve still count as added, with an empty username
+        write("added", ADDED_FIELDS, ((account_id, resolved.get(account_id, "")) for account_id in self.added))
+        write("removed", REMOVED_FIELDS, ((account_id, self.previous[account_id][0]) for account_id in self.removed()))
+        # Screen names are case-insensitive, and the extraction methods do not all preserve case
+        write("renamed", RENAMED_FIELDS, (
+            (account_id, self.previous[account_id][0], resolved[account_id])
+            for account_id in sorted(self.rechecked)
+            if account_id in resolved and resolved[account_id].lower() != self.previous[account_id][0].lower()
+        ))
+        logger.info(
+            f"Diff reports in {report_dir}: {counts['added']} added, {counts['removed']} removed, "
+            f"{counts['renamed']} renamed ({len(self.rechecked)} known accounts re-checked)"
+        )
+        return counts
+
+
+def load_diff_settings(config):
+    """Return the diff section of config.yml with its defaults filled in"""
+    diff_config = config.get('diff') or {}
+    return {
+        'previous_path': diff_config.get('previous_path') or (config.get('output') or {}).get('path', DEFAULT_OUTPUT_FILE),
+        'resolved_path': diff_config.get('resolved_path', DEFAULT_DIFF_OUTPUT_FILE),
+        'report_dir': diff_config.get('report_dir', DEFAULT_REPORT_DIR),
+        'recheck_fraction': diff_config.get('recheck_fraction', 0.0),
+        'stale_days': diff_config.get('stale_days'),
+        'seed': diff_config.get('seed'),
+    }
+
+
+def run_diff(config, entries, recheck_fraction=None, stale_days=None):
+    """Resolve only what changed since the previous run, then rewrite the snapshot and the reports
+
+    ``recheck_fraction`` and ``stale_days`` override the diff section of
+    config.yml. Returns the report counts.
+    """
+    settings = load_diff_settings(config)
+    output_config = config.get('output') or {}
+    output_path = output_config.get('path', DEFAULT_OUTPUT_FILE)
+    if not os.path.exists(settings['previous_path']):
+        raise FileNotFoundError(f"No previous results at {settings['previous_path']}; run a full extraction first")
+
+    diff = SnapshotDiff(
+        read_previous_results(settings['previous_path']),
+        recheck_fraction=settings['recheck_fraction'] if recheck_fraction is None else recheck_fraction,
+        stale_days=settings['stale_days'] if stale_days is None else stale_days,
+        seed=settings['seed'],
+    )
+    # The plan is small next to the archive, and the removed report needs every current ID first
+    pending = list(diff.plan(entries))
+    logger.info(
+        f"Archive diff: {len(diff.added)} new accounts, {len(diff.rechecked)} known accounts to re-check, "
+        f"{diff.unchanged} unchanged"
+    )
+
+    resolved_path = None
+    if pending:
+        # Resolve into a separate file so the previous snapshot stays intact until the merge
+        resolved_path = settings['resolved_path']
+        run_config = dict(config, output=dict(output_config, path=resolved_path))
+        if diff.rechecked:
+            # A cached name would hide exactly the renames the re-check is looking for
+            run_config['cache'] = dict(config.get('cache') or {}, ttl_days=0)
+        run_extraction(run_config, pending, total=len(pending))
+
+    resolved = diff.merge(resolved_path, output_path, fmt=output_config.get('format'))
+    logger.info(f"Snapshot with {len(diff.current_ids)} accounts written to {output_path}")
+    return diff.write_reports(resolved, settings['report_dir'])
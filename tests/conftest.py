@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+from mock_x import MockX, serve  # noqa: E402
+
+
+@pytest.fixture
+def mock_x():
+    """Start bench/mock_x.py with a scenario mix; returns its base URL"""
+    servers = []
+
+    def start(mix, **options):
+        server = serve(MockX(mix, **options))[0]
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,117 @@
+import threading
+import urllib.error
+import urllib.request
+from collections import Counter
+
+import pytest
+
+from batch_lookup import BatchLookup, BatchLookupError
+from engine import resolve_links_in_batches
+from mock_x import GRAPHQL_LOOKUP_PATH, REST_LOOKUP_PATH, expected_username, parse_mix, scenario_for
+from x_urls import USER_LINK_TEMPLATE
+
+MIX = "profile=3,suspended=1"
+
+
+class UrlopenPage:
+    """Stands in for the logged-in page: the lookup fetch goes through urllib"""
+
+    current_url = "https://x.com/home"
+
+    def execute_async_script(self, script, url, headers):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                return {"status": response.status, "body": response.read().decode("utf-8")}
+        except urllib.error.HTTPError as e:
+            return {"status": e.code, "body": e.read().decode("utf-8")}
+
+
+class RecordingRun:
+    def __init__(self):
+        self.usernames = {}
+        self.counts = Counter()
+
+    def record_username(self, url, username, method, elapsed):
+        self.usernames[url] = (username, method)
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.successes = 0
+        self.rate_limited = 0
+
+    def acquire(self):
+        pass
+
+    def on_success(self):
+        self.successes += 1
+
+    def on_rate_limited(self):
+        self.rate_limited += 1
+
+
+def rest_lookup(base_url):
+    return BatchLookup(lookup_url=f"{base_url}{REST_LOOKUP_PATH}?user_id={{ids}}")
+
+
+def graphql_lookup(base_url):
+    return BatchLookup(
+        lookup_url=f"{base_url}{GRAPHQL_LOOKUP_PATH}?user_ids={{ids}}",
+        results_path="data.users", id_path="rest_id", screen_name_path="legacy.screen_name",
+    )
+
+
+@pytest.mark.parametrize("make_lookup", [rest_lookup, graphql_lookup])
+def test_lookup_resolves_mock_usernames(mock_x, make_lookup):
+    lookup = make_lookup(mock_x(MIX))
+    account_ids = list(range(1, 101))
+
+    found = lookup.lookup(UrlopenPage(), account_ids)
+
+    # Suspended accounts are missing from the response and fall through to the browser
+    assert found == {
+        account_id: expected_username(account_id)
+        for account_id in account_ids if scenario_for(account_id, parse_mix(MIX)) != "suspended"
+    }
+    assert len(found) < len(account_ids)
+
+
+@pytest.mark.parametrize("make_lookup", [rest_lookup, graphql_lookup])
+def test_rate_limited_batch_fails_whole(mock_x, make_lookup):
+    lookup = make_lookup(mock_x("profile=3,rate_limited=1"))
+
+    with pytest.raises(BatchLookupError) as failure:
+        lookup.lookup(UrlopenPage(), list(range(1, 11)))
+
+    assert failure.value.status == 429
+
+
+def run_batches(lookup, account_ids):
+    """Returns (run, limiter, links left for the browser)"""
+    run, limiter = RecordingRun(), RecordingLimiter()
+    links = iter([USER_LINK_TEMPLATE.format(account_id) for account_id in account_ids])
+    page = UrlopenPage()
+    left = list(resolve_links_in_batches(links, lookup, lambda: page, threading.Lock(), run, limiter))
+    return run, limiter, left
+
+
+def test_batches_leave_missing_ids_to_the_browser(mock_x):
+    run, limiter, left = run_batches(rest_lookup(mock_x(MIX)), range(1, 251))
+
+    suspended = [account_id for account_id in range(1, 251) if scenario_for(account_id, parse_mix(MIX)) == "suspended"]
+    assert left == [USER_LINK_TEMPLATE.format(account_id) for account_id in suspended]
+    assert run.usernames == {
+        USER_LINK_TEMPLATE.format(account_id): (expected_username(account_id), "batch_lookup")
+        for account_id in range(1, 251) if account_id not in suspended
+    }
+    assert run.counts["batch"] == 250 - len(suspended)
+    assert limiter.successes == 3 and limiter.rate_limited == 0
+
+
+def test_rate_limited_batches_fall_through(mock_x):
+    account_ids = list(range(1, 251))
+    run, limiter, left = run_batches(rest_lookup(mock_x("profile=3,rate_limited=1")), account_ids)
+
+    assert left == [USER_LINK_TEMPLATE.format(account_id) for account_id in account_ids]
+    assert run.usernames == {}
+    assert limiter.rate_limited == 3
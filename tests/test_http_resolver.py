@@ -0,0 +1,122 @@
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import http_resolver
+from mock_x import QuietHTTPServer, expected_username, parse_mix, scenario_for
+from x_urls import USER_LINK_TEMPLATE, parse_account_id
+
+pytestmark = pytest.mark.skipif(not http_resolver.is_available(), reason="aiohttp is not installed")
+
+COOKIES = [{"name": "auth_token", "value": "secret"}, {"name": "ct0", "value": "csrf"}]
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = 0
+        self.successes = 0
+        self.rate_limited = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+    def on_success(self):
+        self.successes += 1
+
+    def on_rate_limited(self):
+        self.rate_limited += 1
+
+
+def host_map(base_url):
+    return {"https://twitter.com": base_url, "https://x.com": base_url}
+
+
+def resolve(resolver, account_ids):
+    """Returns ({account_id: (username, method)}, [unresolved account_id])"""
+    found = {}
+
+    def on_result(url, result, elapsed):
+        found[parse_account_id(url)] = result
+
+    unresolved = resolver.resolve([USER_LINK_TEMPLATE.format(account_id) for account_id in account_ids], on_result)
+    return found, [parse_account_id(url) for url in unresolved]
+
+
+def test_resolves_mock_usernames(mock_x):
+    mix = "profile=2,screen_name=1,chain=1,suspended=1"
+    resolver = http_resolver.HttpResolver(cookies=COOKIES, concurrency=4, host_map=host_map(mock_x(mix)))
+    account_ids = list(range(1, 61))
+
+    found, unresolved = resolve(resolver, account_ids)
+
+    suspended = [account_id for account_id in account_ids if scenario_for(account_id, parse_mix(mix)) == "suspended"]
+    assert suspended and unresolved == suspended
+    assert {account_id: username for account_id, (username, _) in found.items()} == {
+        account_id: expected_username(account_id) for account_id in account_ids if account_id not in suspended
+    }
+    assert {method for _, method in found.values()} == {"http_url_path", "http_screen_name"}
+    assert not resolver.rate_limited
+
+
+def test_hands_off_after_429(mock_x):
+    mix = "profile=3,rate_limited=1"
+    limiter = RecordingLimiter()
+    resolver = http_resolver.HttpResolver(concurrency=1, host_map=host_map(mock_x(mix)), limiter=limiter)
+    account_ids = list(range(1, 41))
+    first_429 = next(
+        index for index, account_id in enumerate(account_ids) if scenario_for(account_id, parse_mix(mix)) == "rate_limited"
+    )
+    assert 0 < first_429 < len(account_ids) - 1
+
+    found, unresolved = resolve(resolver, account_ids)
+
+    assert resolver.rate_limited
+    assert limiter.rate_limited == 1
+    # Everything from the first 429 on is left to the browser, in order
+    assert unresolved == account_ids[first_429:]
+    assert found == {account_id: (expected_username(account_id), "http_url_path") for account_id in account_ids[:first_429]}
+    assert limiter.acquired == limiter.successes + 1
+
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    location = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.cookies.append(self.headers.get("Cookie"))
+        self.send_response(302 if self.location else 404)
+        if self.location:
+            self.send_header("Location", self.location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def recording_server(location=None):
+    handler = type("Handler", (RecordingHandler,), {"location": location})
+    server = QuietHTTPServer(("127.0.0.1", 0), handler)
+    server.cookies = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_cookies_only_go_to_x_hosts():
+    elsewhere = recording_server()
+    x_host = recording_server(location=f"http://127.0.0.1:{elsewhere.server_port}/landing")
+    try:
+        resolver = http_resolver.HttpResolver(
+            cookies=COOKIES, concurrency=1, host_map=host_map(f"http://127.0.0.1:{x_host.server_port}"),
+        )
+        found, unresolved = resolve(resolver, [12345])
+    finally:
+        for server in (x_host, elsewhere):
+            server.shutdown()
+            server.server_close()
+
+    assert x_host.cookies == ["auth_token=secret; ct0=csrf"]
+    # A redirect off X ends the chain before anything is sent there
+    assert elsewhere.cookies == []
+    assert found == {} and unresolved == [12345]
@@ -0,0 +1,75 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_CACHE_FILE = "username_cache.db"
+DEFAULT_TTL_DAYS = 30
+
+
+class UsernameCache:
+    """Persistent account ID -> username cache stored in SQLite
+
+    Entries older than ``ttl_days`` are treated as misses so renamed accounts
+    are eventually picked up again. ``ttl_days=None`` keeps entries forever.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttl_days=DEFAULT_TTL_DAYS):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days is not None else None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usernames (
+                account_id INTEGER PRIMARY KEY,
+                username TEXT NOT NULL,
+                method TEXT,
+                resolved_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        logger.info(f"Username cache opened at {path} ({self.count()} entries)")
+
+    def _is_fresh(self, resolved_at):
+        if self.ttl_seconds is None:
+            return True
+        return time.time() - resolved_at < self.ttl_seconds
+
+    def get(self, account_id):
+        """Return (username, method) for a fresh entry, or None on a miss"""
+        if account_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT username, method, resolved_at FROM usernames WHERE account_id = ?",
+                (account_id,),
+            ).fetchone()
+        if row and self._is_fresh(row[2]):
+            return row[0], row[1]
+        return None
+
+    def put(self, account_id, username, method=None):
+        """Store or refresh the username resolved for an account ID"""
+        if account_id is None or not username:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO usernames (account_id, username, method, resolved_at) VALUES (?, ?, ?, ?)",
+                (account_id, username, method, time.time()),
+            )
+            self._conn.commit()
+
+    def count(self):
+        """Return the number of stored entries, fresh or stale"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM usernames").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,365 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from checkpoint import journal_key, OUTCOME_DONE, OUTCOME_FAILED
+from x_urls import parse_account_id, normalize_user_link
+
+logger = logging.getLogger('follower_extractor')
+
+DEFAULT_QUEUE_FILE = "work_queue.db"
+DEFAULT_CHUNK_SIZE = 500  # Account IDs per lease
+DEFAULT_LEASE_SECONDS = 600  # A chunk goes back to the pool if its lease is not renewed in time
+DEFAULT_BUSY_TIMEOUT = 120  # Seconds to wait for another host's transaction
+LOAD_BATCH = 10000  # Entries committed per transaction while the archive is loaded
+LOAD_POLL = 5  # Seconds between checks while another host loads the archive
+
+# Answers of _start_load
+LOADED = "loaded"
+LOADING_ELSEWHERE = "loading_elsewhere"
+LOADER = "loader"
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS chunks (
+        chunk_id INTEGER PRIMARY KEY,
+        status TEXT NOT NULL DEFAULT 'pending',
+        owner TEXT,
+        token TEXT,
+        lease_expires REAL,
+        claims INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS items (
+        item_key TEXT PRIMARY KEY,
+        account_id INTEGER,
+        url TEXT NOT NULL,
+        chunk_id INTEGER NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        username TEXT,
+        method TEXT,
+        worker TEXT,
+        updated_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS items_by_chunk ON items (chunk_id, status)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+
+class Lease:
+    """A chunk of account IDs claimed by one worker until ``expires``"""
+
+    def __init__(self, chunk_id, token, entries, expires):
+        self.chunk_id = chunk_id
+        self.token = token
+        self.entries = entries
+        self.expires = expires
+
+
+class WorkQueue:
+    """Shared work queue in a SQLite file that several hosts process together
+
+    The archive is loaded once into fixed-size chunks. A worker claims a chunk
+    under a time-limited lease, renews it from a heartbeat thread while it
+    works, and commits each outcome in a transaction that first checks it
+    still holds the lease. Leases that are not renewed expire and the chunk's
+    unfinished IDs go back to the pool, so a dead host loses nothing and a
+    slow one cannot overwrite results committed by the host that took over.
+
+    The file uses SQLite's rollback journal rather than WAL, which needs
+    shared memory and does not work on network filesystems.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_FILE, worker=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, busy_timeout=DEFAULT_BUSY_TIMEOUT):
+        self.path = path
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.chunk_size = max(1, int(chunk_size))
+        self.lease_seconds = lease_seconds
+        self._leases = {}
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+        logger.info(f"Work queue opened at {path} as worker {self.worker}")
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two hosts can never claim the same chunk
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def load(self, entries, poll=LOAD_POLL):
+        """Load (account_id, userLink) entries once; later calls from any host are no-ops
+
+        Returns the number of new IDs queued. Duplicate accounts are dropped.
+        Entries are committed in batches, so other hosts are never locked out
+        for long; they wait until the loading host marks the queue as loaded,
+        and take the load over if that host stops updating its marker for
+        ``lease_seconds``.
+        """
+        while True:
+            role = self._start_load()
+            if role == LOADED:
+                logger.info("Work queue already loaded, joining the existing run")
+                return 0
+            if role == LOADER:
+                break
+            logger.info(f"Another worker is loading the work queue, checking again in {poll}s")
+            time.sleep(poll)
+
+        with self._lock:
+            # A load taken over from a worker that stopped continues after the IDs it queued
+            added = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        queued = added
+        batch = []
+        for account_id, url in entries:
+            # Store links the way the engine normalizes them so outcomes find their item
+            if account_id is None:
+                account_id = parse_account_id(url)
+            url = normalize_user_link(account_id, url)
+            batch.append((journal_key(account_id, url), account_id, url))
+            if len(batch) >= LOAD_BATCH:
+                added += self._insert_batch(batch, added)
+                batch = []
+        if batch:
+            added += self._insert_batch(batch, added)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO chunks (chunk_id) SELECT DISTINCT chunk_id FROM items")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('loaded', ?)", (str(time.time()),))
+            conn.execute("DELETE FROM meta WHERE key = 'loading'")
+        logger.info(f"Loaded {added - queued} accounts into the work queue in chunks of {self.chunk_size}")
+        return added - queued
+
+    def _start_load(self):
+        """Take the loader role unless the queue is loaded or another live worker is loading it"""
+        now = time.time()
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'loaded'").fetchone():
+                return LOADED
+            row = conn.execute("SELECT value FROM meta WHERE key = 'loading'").fetchone()
+            if row is not None:
+                updated, _, owner = row[0].partition(" ")
+                if owner != self.worker and now - float(updated) < self.lease_seconds:
+                    return LOADING_ELSEWHERE
+                if owner != self.worker:
+                    logger.warning(f"Worker {owner} stopped loading the work queue, taking the load over")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('loading', ?)", (f"{now} {self.worker}",)
+            )
+        return LOADER
+
+    def _insert_batch(self, batch, offset):
+        with self._transaction() as conn:
+            added = self._insert(conn, batch, offset)
+            # Keeps the loading marker fresh so waiting workers know the load is still going
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('loading', ?)", (f"{time.time()} {self.worker}",)
+            )
+        return added
+
+    def _insert(self, conn, batch, offset):
+        added = 0
+        for key, account_id, url in batch:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO items (item_key, account_id, url, chunk_id) VALUES (?, ?, ?, ?)",
+                (key, account_id, url, (offset + added) // self.chunk_size),
+            )
+            added += cursor.rowcount
+        return added
+
+    def claim(self):
+        """Lease the next chunk with unfinished IDs, reclaiming expired leases first; None if there is none"""
+        while True:
+            now = time.time()
+            with self._transaction() as conn:
+                reclaimed = conn.execute(
+                    "UPDATE chunks SET status = 'pending', owner = NULL, token = NULL "
+                    "WHERE status = 'leased' AND lease_expires < ?",
+                    (now,),
+                ).rowcount
+                row = conn.execute(
+                    "SELECT chunk_id FROM chunks WHERE status = 'pending' ORDER BY chunk_id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                chunk_id, token, expires = row[0], uuid.uuid4().hex, now + self.lease_seconds
+                entries = conn.execute(
+                    "SELECT account_id, url FROM items WHERE chunk_id = ? AND status = 'pending' ORDER BY rowid",
+                    (chunk_id,),
+                ).fetchall()
+                if entries:
+                    conn.execute(
+                        "UPDATE chunks SET status = 'leased', owner = ?, token = ?, lease_expires = ?, "
+                        "claims = claims + 1 WHERE chunk_id = ?",
+                        (self.worker, token, expires, chunk_id),
+                    )
+                else:
+                    # Finished by an earlier owner that died before closing it
+                    conn.execute("UPDATE chunks SET status = 'done' WHERE chunk_id = ?", (chunk_id,))
+            if reclaimed:
+                logger.warning(f"Reclaimed {reclaimed} chunk(s) whose lease expired")
+            if entries:
+                lease = Lease(chunk_id, token, entries, expires)
+                with self._lock:
+                    self._leases[chunk_id] = lease
+                logger.info(f"Leased chunk {chunk_id} ({len(entries)} accounts)")
+                return lease
+
+    def iter_entries(self):
+        """Yield entries from one leased chunk after another until none are left to claim"""
+        while True:
+            lease = self.claim()
+            if lease is None:
+                return
+            yield from lease.entries
+
+    def record(self, account_id, url, outcome, username=None, method=None):
+        """Commit one outcome if this worker still holds the lease on its chunk; returns True if committed"""
+        key = journal_key(account_id, url)
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT items.chunk_id, chunks.token FROM items JOIN chunks ON chunks.chunk_id = items.chunk_id "
+                "WHERE items.item_key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return False
+            chunk_id, token = row
+            lease = self._leases.get(chunk_id)
+            if lease is None or lease.token != token:
+                logger.warning(f"Lease on chunk {chunk_id} was lost, not committing {key}")
+                return False
+            conn.execute(
+                "UPDATE items SET status = ?, username = ?, method = ?, worker = ?, updated_at = ? "
+                "WHERE item_key = ? AND status = 'pending'",
+                (outcome, username, method, self.worker, time.time(), key),
+            )
+            if not conn.execute(
+                "SELECT 1 FROM items WHERE chunk_id = ? AND status = 'pending' LIMIT 1", (chunk_id,)
+            ).fetchone():
+                conn.execute("UPDATE chunks SET status = 'done' WHERE chunk_id = ?", (chunk_id,))
+                self._leases.pop(chunk_id, None)
+        return True
+
+    def record_done(self, account_id, url, username, method=None):
+        return self.record(account_id, url, OUTCOME_DONE, username, method)
+
+    def record_failed(self, account_id, url, reason):
+        return self.record(account_id, url, OUTCOME_FAILED, method=reason)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.heartbeat()
+
+    def heartbeat(self):
+        """Extend every lease this worker holds; leases already taken over are dropped"""
+        with self._lock:
+            leases = list(self._leases.values())
+        if not leases:
+            return
+        expires = time.time() + self.lease_seconds
+        try:
+            with self._transaction() as conn:
+                for lease in leases:
+                    renewed = conn.execute(
+                        "UPDATE chunks SET lease_expires = ? WHERE chunk_id = ? AND token = ? AND status = 'leased'",
+                        (expires, lease.chunk_id, lease.token),
+                    ).rowcount
+                    if renewed:
+                        lease.expires = expires
+                    elif self._leases.pop(lease.chunk_id, None) is not None:
+                        logger.warning(f"Lost the lease on chunk {lease.chunk_id}")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not renew leases: {e}")
+
+    def release(self):
+        """Give back every held lease so other workers can take the unfinished IDs straight away"""
+        released = 0
+        with self._transaction() as conn:
+            for lease in self._leases.values():
+                released += conn.execute(
+                    "UPDATE chunks SET status = 'pending', owner = NULL, token = NULL "
+                    "WHERE chunk_id = ? AND token = ? AND status = 'leased'",
+                    (lease.chunk_id, lease.token),
+                ).rowcount
+            self._leases.clear()
+        if released:
+            logger.info(f"Released {released} unfinished chunk(s)")
+
+    def status(self):
+        """Return counts of chunks and items by status, plus the earliest lease expiry"""
+        with self._lock:
+            return _status(self._conn)
+
+    def iter_results(self):
+        """Yield (account_id, url, status, username, method) for every finished item"""
+        # A separate connection streams the rows without holding up the workers
+        return iter_queue_results(self.path)
+
+    def close(self):
+        self._stop.set()
+        self._heartbeat.join(timeout=5)
+        self.release()
+        with self._lock:
+            self._conn.close()
+
+
+def _status(conn):
+    chunks = dict(conn.execute("SELECT status, COUNT(*) FROM chunks GROUP BY status").fetchall())
+    items = dict(conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+    next_expiry = conn.execute("SELECT MIN(lease_expires) FROM chunks WHERE status = 'leased'").fetchone()[0]
+    return {"chunks": chunks, "items": items, "next_expiry": next_expiry}
+
+
+def open_read_only(path):
+    """Connect to a queue file without creating it, changing its schema or taking a write lock"""
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def read_queue_status(path=DEFAULT_QUEUE_FILE):
+    """WorkQueue.status for readers that are not workers, e.g. the status command"""
+    conn = open_read_only(path)
+    try:
+        return _status(conn)
+    finally:
+        conn.close()
+
+
+def iter_queue_results(path=DEFAULT_QUEUE_FILE):
+    """Yield (account_id, url, status, username, method) for every finished item, read-only"""
+    conn = open_read_only(path)
+    try:
+        yield from conn.execute(
+            "SELECT account_id, url, status, username, method FROM items WHERE status != 'pending' ORDER BY rowid"
+        )
+    finally:
+        conn.close()
+
+
+def load_work_queue(config, path=None):
+    """Open the shared work queue configured in the work_queue section of config.yml"""
+    queue_config = config.get('work_queue') or {}
+    return WorkQueue(
+        path=path or queue_config.get('path', DEFAULT_QUEUE_FILE),
+        worker=queue_config.get('worker_name'),
+        chunk_size=queue_config.get('chunk_size', DEFAULT_CHUNK_SIZE),
+        lease_seconds=queue_config.get('lease_seconds', DEFAULT_LEASE_SECONDS),
+    )
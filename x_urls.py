@@ -0,0 +1,133 @@
+import logging
+import re
+import time
+
+logger = logging.getLogger('follower_extractor')
+
+# Numeric account ID in archive links, e.g. https://twitter.com/intent/user?user_id=12345
+ACCOUNT_ID_PATTERN = re.compile(r'user_id=(\d+)')
+SCREEN_NAME_PATTERN = re.compile(r'screen_name=([^&]+)')
+PROFILE_PATH_PATTERN = re.compile(r'(?:x|twitter)\.com/([^/\?#]+)')
+USER_LINK_TEMPLATE = "https://twitter.com/intent/user?user_id={}"
+HANDLE_PATTERN = re.compile(r'@(\w{1,15})\b')
+
+# First path segments on x.com that are never usernames
+RESERVED_PATHS = {
+    "intent", "i", "user", "home", "login", "logout", "explore", "search",
+    "notifications", "messages", "settings", "account", "compose", "hashtag", "share",
+}
+
+# Redirect settling: stop as soon as the URL is terminal, or once it has been
+# stable for REDIRECT_SETTLE seconds on a fully loaded page
+REDIRECT_TIMEOUT = 10
+REDIRECT_SETTLE = 2.0
+REDIRECT_POLL = 0.1
+
+# Error pages that can be recognised from the URL or the first part of the page text
+RATE_LIMITED = "rate_limited"
+LOGGED_OUT = "logged_out"  # The session expired and X sent the browser to the login flow
+CHALLENGE = "challenge"  # X wants the account to verify itself
+SUSPENDED = "suspended"
+NOT_FOUND = "not_found"
+ERROR_PAGE_MARKERS = (
+    (RATE_LIMITED, ("rate limit exceeded", "too many requests")),
+    (LOGGED_OUT, ("x.com/i/flow/login", "x.com/login", "x.com/logout")),
+    (CHALLENGE, ("x.com/account/access",)),
+    (SUSPENDED, ("account suspended", "/account/suspended")),
+    (NOT_FOUND, ("this account doesn’t exist", "this account doesn't exist")),
+)
+ERROR_PAGE_SCRIPT = (
+    "location.href + ' ' + (document.title || '') + ' ' +"
+    " (document.body ? document.body.innerText.slice(0, 2000) : '')"
+)
+
+
+def parse_account_id(url):
+    """Return the numeric account ID from a userLink, or None if it has none"""
+    match = ACCOUNT_ID_PATTERN.search(url or "")
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def username_from_url(url):
+    """Extract a username from a profile URL
+
+    Returns a (username, method) tuple, or (None, None) if the URL does not
+    name an account.
+    """
+    # Pattern 1: ?screen_name=USERNAME
+    screen_name_match = SCREEN_NAME_PATTERN.search(url or "")
+    if screen_name_match:
+        return screen_name_match.group(1), "screen_name"
+
+    # Pattern 2: x.com/USERNAME or twitter.com/USERNAME (but not system paths)
+    path_match = PROFILE_PATH_PATTERN.search(url or "")
+    if path_match and path_match.group(1) not in RESERVED_PATHS:
+        return path_match.group(1), "url_path"
+
+    return None, None
+
+
+def normalize_user_link(account_id, url):
+    """Strip a userLink and rebuild the canonical intent link when it does not carry ``account_id``"""
+    url = (url or "").strip()
+    if account_id is not None and parse_account_id(url) != account_id and not username_from_url(url)[0]:
+        return USER_LINK_TEMPLATE.format(account_id)
+    return url
+
+
+def username_from_text(text):
+    """Extract a username from page text such as "Name (@handle) / X" or a profile URL"""
+    handle_match = HANDLE_PATTERN.search(text or "")
+    if handle_match:
+        return handle_match.group(1)
+    return username_from_url(text)[0]
+
+
+def wait_for_redirects(driver, timeout=REDIRECT_TIMEOUT, settle=REDIRECT_SETTLE, poll=REDIRECT_POLL, previous_url=None):
+    """Return the final URL once redirects are done
+
+    Finishes immediately when the URL names an account, otherwise when it has
+    not changed for ``settle`` seconds on a loaded page, or after ``timeout``.
+    ``previous_url`` is the page before navigation: while the browser still
+    shows it the navigation has not committed, and None is returned if it
+    never does.
+    """
+    started = time.time()
+    last_url = driver.current_url
+    last_change = started
+    while True:
+        navigated = last_url != previous_url
+        if navigated and username_from_url(last_url)[0]:
+            return last_url
+        now = time.time()
+        if now - started >= timeout:
+            return last_url if navigated else None
+        # "interactive" counts as loaded so eager page loads settle without waiting for subresources
+        if navigated and now - last_change >= settle and driver.execute_script("return document.readyState") != "loading":
+            return last_url
+
+        time.sleep(poll)
+        current_url = driver.current_url
+        if current_url != last_url:
+            logger.debug(f"Redirect detected to: {current_url}")
+            last_url = current_url
+            last_change = time.time()
+
+
+def classify_error_page(text):
+    """Map page text from ERROR_PAGE_SCRIPT to RATE_LIMITED, LOGGED_OUT, CHALLENGE, SUSPENDED, NOT_FOUND or None"""
+    text = (text or "").lower()
+    for reason, markers in ERROR_PAGE_MARKERS:
+        if any(marker in text for marker in markers):
+            return reason
+    return None
+
+
+def detect_error_page(driver):
+    """Classify X's rate-limit, suspended and missing-account pages
+
+    Returns RATE_LIMITED, LOGGED_OUT, CHALLENGE, SUSPENDED, NOT_FOUND or None for any other page.
+    """
+    return classify_error_page(driver.execute_script(f"return {ERROR_PAGE_SCRIPT};"))